@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def temp_cache(tmp_path_factory):
+    """Кэш тестов во временном каталоге, как в core.runner.TestRunner."""
+    from core.runner import temp_cache
+
+    with temp_cache(str(tmp_path_factory.mktemp('cache'))):
+        yield
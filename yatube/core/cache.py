@@ -0,0 +1,271 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import Http404
+from django.utils.cache import (
+    get_cache_key, has_vary_header, learn_cache_key
+)
+from django.utils.http import quote_etag
+
+from .personal import fill
+
+
+def _version_key(name):
+    return f'version:{name}'
+
+
+def _initial_version():
+    # Если ключ версии вытеснен из кэша, новая версия не должна совпасть
+    # со старой, иначе снова начнут отдаваться устаревшие страницы.
+    return int(time.time() * 1000)
+
+
+def get_versions(names):
+    """Возвращает текущие версии для списка имён одним запросом к кэшу."""
+    keys = [_version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*names):
+    """Инвалидирует всё, что закэшировано под версиями names.
+
+    Возвращает новые версии в том же порядке.
+    """
+    versions = []
+    for name in names:
+        try:
+            versions.append(cache.incr(_version_key(name)))
+        except ValueError:
+            versions.append(_initial_version())
+            cache.set(_version_key(name), versions[-1], None)
+    return versions
+
+
+def etag_for(request, names, *extra):
+    """ETag страницы, собранный без обращения к базе.
+
+    Учитывает адрес, пользователя (от него зависят персональные
+    фрагменты) и версии names, которые сбрасываются при изменении
+    данных на странице; extra - дополнительные значения от view.
+    """
+    return _etag(request, get_versions(names), *extra)
+
+
+def _etag(request, versions, *extra):
+    parts = [request.get_full_path(), request.user.pk, *versions, *extra]
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _serve(request, response, versions):
+    # ETag считается по версиям отданной копии, а не по текущим: иначе
+    # устаревшая копия получила бы ETag свежей и клиент держал бы её,
+    # получая 304, до следующего сброса версий.
+    response = fill(request, response)
+    if response.status_code == 200:
+        response['ETag'] = quote_etag(_etag(request, versions))
+    return response
+
+
+def versioned_etag(*namespaces):
+    """etag_func для condition() по тем же namespaces, что и у кэша."""
+    def etag(request, *args, **kwargs):
+        return etag_for(
+            request, [namespace.format(**kwargs) for namespace in namespaces]
+        )
+    return etag
+
+
+def _acquire(lock_key):
+    return cache.add(lock_key, 1, settings.CACHE_REBUILD_LOCK_TIMEOUT)
+
+
+def _wait_for(key):
+    """Ждёт, пока другой процесс соберёт страницу, но не дольше лимита."""
+    deadline = time.monotonic() + settings.CACHE_REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _is_cacheable(request, response):
+    if response.streaming or response.status_code != 200:
+        return False
+    if 'private' in response.get('Cache-Control', ''):
+        return False
+    # Как в CacheMiddleware: не кэшируем ответ, выставляющий куки
+    # запросу без кук, иначе чужая сессия попадёт в общий кэш.
+    return not (
+        not request.COOKIES
+        and response.cookies
+        and has_vary_header(response, 'Cookie')
+    )
+
+
+def _render_shared(view, request, *args, **kwargs):
+    user = request.user
+    request.user = AnonymousUser()
+    request.shared_render = True
+    try:
+        return view(request, *args, **kwargs)
+    finally:
+        request.user = user
+        request.shared_render = False
+
+
+def cache_page_versioned(timeout, *namespaces):
+    """Кэширует страницу с учётом версий namespaces.
+
+    Пространства имён форматируются аргументами view, например
+    'feed:group:{slug}'. Запись считается свежей timeout секунд и пока
+    версии не сброшены через bump(). Устаревшая запись ещё
+    CACHE_STALE_TIMEOUT секунд отдаётся остальным запросам, пока один
+    запрос, взявший блокировку, собирает страницу заново.
+
+    Страница собирается от имени анонима и одна копия отдаётся всем:
+    зависящие от пользователя куски выводятся тегом {% personal %}
+    и подставляются в ответ для каждого запроса отдельно.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            names = [namespace.format(**kwargs) for namespace in namespaces]
+            versions = get_versions(names)
+            key_prefix = hashlib.md5(repr(names).encode()).hexdigest()
+            lock_key = 'rebuild:{}:{}'.format(
+                key_prefix,
+                hashlib.md5(request.get_full_path().encode()).hexdigest(),
+            )
+            key = get_cache_key(request, key_prefix, 'GET', cache=cache)
+            entry = cache.get(key) if key else None
+            locked = False
+            if entry is not None:
+                fresh = (
+                    entry['versions'] == versions
+                    and time.time() < entry['fresh_until']
+                )
+                locked = not fresh and _acquire(lock_key)
+                if not locked:
+                    return _serve(
+                        request, entry['response'], entry['versions']
+                    )
+            else:
+                locked = _acquire(lock_key)
+                if not locked:
+                    entry = _wait_for(key) if key else None
+                    if entry is not None:
+                        return _serve(
+                            request, entry['response'], entry['versions']
+                        )
+            try:
+                response = _render_shared(view, request, *args, **kwargs)
+                if _is_cacheable(request, response):
+                    lifetime = timeout + settings.CACHE_STALE_TIMEOUT
+                    key = learn_cache_key(
+                        request, response, lifetime, key_prefix, cache=cache
+                    )
+                    cache.set(key, {
+                        'response': response,
+                        'versions': versions,
+                        'fresh_until': time.time() + timeout,
+                    }, lifetime)
+            finally:
+                # Чужую блокировку не снимаем: запрос, не дождавшийся
+                # сборки, рендерит сам, но не мешает взявшему её.
+                if locked:
+                    cache.delete(lock_key)
+            return _serve(request, response, versions)
+        return wrapper
+    return decorator
+
+
+class ObjectCache:
+    """Read-through кэш объектов модели по уникальному полю.
+
+    Первый уровень - небольшой LRU в памяти процесса с коротким сроком
+    жизни, второй - общий кэш. Записи сбрасываются через invalidate()
+    из сигналов модели; в других процессах копия первого уровня живёт
+    не дольше OBJECT_CACHE_L1_TIMEOUT секунд.
+
+    Первый уровень хранит объекты в pickle и каждому вызову get()
+    отдаёт новую копию: иначе закэшированные на экземпляре связанные
+    объекты (например, user.stats) переходили бы из запроса в запрос.
+    """
+    missing = 'missing'
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.prefix = f'obj:{model._meta.label_lower}:{field}'
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, value):
+        return '{}:{}'.format(
+            self.prefix, hashlib.md5(str(value).encode()).hexdigest()
+        )
+
+    def _get_local(self, key):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            data, expires = item
+            if expires < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+        return pickle.loads(data)
+
+    def _set_local(self, key, obj):
+        with self._lock:
+            self._local[key] = (
+                pickle.dumps(obj, pickle.HIGHEST_PROTOCOL),
+                time.monotonic() + settings.OBJECT_CACHE_L1_TIMEOUT
+            )
+            self._local.move_to_end(key)
+            while len(self._local) > settings.OBJECT_CACHE_L1_SIZE:
+                self._local.popitem(last=False)
+
+    def get(self, value):
+        """Возвращает объект или None, если такого нет."""
+        key = self._key(value)
+        obj = self._get_local(key)
+        if obj is None:
+            obj = cache.get(key)
+            if obj is None:
+                obj = self.model._default_manager.filter(
+                    **{self.field: value}
+                ).first() or self.missing
+                cache.set(key, obj, settings.OBJECT_CACHE_TIMEOUT)
+            self._set_local(key, obj)
+        return None if obj == self.missing else obj
+
+    def get_or_404(self, value):
+        obj = self.get(value)
+        if obj is None:
+            raise Http404(f'No {self.model._meta.object_name} matches.')
+        return obj
+
+    def invalidate(self, *values):
+        keys = [self._key(value) for value in values if value is not None]
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        cache.delete_many(keys)
@@ -0,0 +1,78 @@
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище ключей sorl-thumbnail с пакетным чтением.
+
+    get_many() забирает записи для целой страницы одним запросом к кэшу
+    и одним запросом к базе для промахов вместо запроса на картинку.
+    """
+
+    def get_many(self, image_files):
+        """Возвращает {key: ImageFile или None} для списка image_files."""
+        raw_keys = {
+            add_prefix(image_file.key): image_file.key
+            for image_file in image_files
+        }
+        values = self.cache.get_many(list(raw_keys))
+        missing = [key for key in raw_keys if key not in values]
+        if missing:
+            found = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            # Как и _get_raw, запоминаем в кэше и отсутствие записи.
+            fetched = {
+                key: found.get(key, cached_db_kvstore.EMPTY_VALUE)
+                for key in missing
+            }
+            self.cache.set_many(fetched, settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fetched)
+        return {
+            key: (
+                None if values[raw_key] == cached_db_kvstore.EMPTY_VALUE
+                else deserialize_image_file(values[raw_key])
+            )
+            for raw_key, key in raw_keys.items()
+        }
+
+    def iter_sources(self, after=''):
+        """Ключи исходников с миниатюрами по возрастанию, начиная после after.
+
+        Записи читаются из базы пачками, а не целиком, как _find_keys.
+        """
+        prefix = add_prefix('', 'thumbnails')
+        keys = KVStoreModel.objects.filter(
+            key__startswith=prefix, key__gt=add_prefix(after, 'thumbnails')
+        ).order_by('key').values_list('key', flat=True)
+        for key in keys.iterator():
+            yield del_prefix(key)
+
+    def prune(self, keys, dry_run=False):
+        """Удаляет миниатюры исходников из keys, которых больше нет.
+
+        Сами ключи исходника и его миниатюр тоже удаляются. Возвращает
+        удалённые файлы миниатюр с размерами.
+        """
+        removed = []
+        for key in keys:
+            source = self._get(key)
+            if source is not None and source.exists():
+                continue
+            for thumbnail_key in self._get(key, identity='thumbnails') or []:
+                thumbnail = self._get(thumbnail_key)
+                if thumbnail is not None and thumbnail.exists():
+                    size = thumbnail.storage.size(thumbnail.name)
+                    removed.append((thumbnail.name, size))
+                    if not dry_run:
+                        thumbnail.delete()
+                if not dry_run:
+                    self._delete(thumbnail_key)
+            if not dry_run:
+                self._delete(key, identity='thumbnails')
+                self._delete(key)
+        return removed
@@ -0,0 +1,185 @@
+import base64
+import binascii
+import heapq
+from operator import itemgetter
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(created, pk):
+    """Упаковывает ключ (created, id) в непрозрачный токен для URL."""
+    raw = f'{created.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора. Для испорченного токена вернёт None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created, pk = raw.rsplit('|', 1)
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if created is None:
+        return None
+    return created, pk
+
+
+class LimitedPaginator(Paginator):
+    """Нумерованные страницы только для начала списка.
+
+    COUNT идёт по выборке с LIMIT на одну запись больше max_pages
+    страниц: его цена не растёт с размером таблицы, а последняя
+    нумерованная страница знает, есть ли что-то дальше. Дальше листают
+    по курсору.
+    """
+
+    def __init__(self, object_list, per_page, max_pages):
+        super().__init__(object_list, per_page)
+        self.max_pages = max_pages
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.per_page * self.max_pages + 1].count()
+
+
+class CursorPage(Page):
+    """Страница, полученная по курсору: без номера и общего количества."""
+
+    def __init__(
+        self, object_list, paginator, next_cursor=None, previous_cursor=None
+    ):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (created, id) без COUNT и OFFSET.
+
+    По умолчанию записи отдаются от новых к старым, с descending=False -
+    от старых к новым. Стоимость страницы не зависит от её глубины:
+    каждая выборка - это диапазон по индексу.
+    """
+    is_cursor = True
+
+    def __init__(
+        self, object_list, per_page, key=('created', 'id'), descending=True
+    ):
+        super().__init__(object_list, per_page)
+        self.key = key
+        self.descending = descending
+
+    def sort_key(self, obj):
+        created_field, pk_field = self.key
+        return getattr(obj, created_field), getattr(obj, pk_field)
+
+    def cursor_for(self, obj):
+        return encode_cursor(*self.sort_key(obj))
+
+    def _ordered(self, forward=True):
+        prefix = '-' if forward == self.descending else ''
+        created_field, pk_field = self.key
+        return self.object_list.order_by(
+            f'{prefix}{created_field}', f'{prefix}{pk_field}'
+        )
+
+    def _beyond(self, cursor, forward):
+        """Записи за курсором: дальше по ленте (forward) или ближе к началу."""
+        created, pk = cursor
+        lookup = 'lt' if forward == self.descending else 'gt'
+        created_field, pk_field = self.key
+        return self._ordered(forward).filter(
+            Q(**{f'{created_field}__{lookup}': created})
+            | Q(**{f'{pk_field}__{lookup}': pk}),
+            **{f'{created_field}__{lookup}e': created},
+        )
+
+    def fetch(self, after=None, before=None):
+        """Возвращает пары (ключ, запись) за курсором в порядке выборки.
+
+        Курсоры передаются уже распакованными. Для before записи идут
+        в обратном порядке ленты, начиная с ближайшей к курсору.
+        """
+        if before:
+            queryset = self._beyond(before, forward=False)
+        elif after:
+            queryset = self._beyond(after, forward=True)
+        else:
+            queryset = self._ordered()
+        return [
+            (self.sort_key(obj), obj)
+            for obj in queryset[:self.per_page + 1]
+        ]
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после курсора after или перед before.
+
+        Без курсора (или с испорченным курсором) отдаёт первую страницу.
+        """
+        before = before and decode_cursor(before)
+        after = None if before else after and decode_cursor(after)
+        pairs = self.fetch(after=after, before=before)
+        if before:
+            if not pairs:
+                return self.get_page()
+            has_previous = len(pairs) > self.per_page
+            pairs = pairs[:self.per_page][::-1]
+            has_next = True
+        else:
+            has_previous = bool(after and pairs)
+            has_next = len(pairs) > self.per_page
+            pairs = pairs[:self.per_page]
+        return CursorPage(
+            [obj for _, obj in pairs],
+            self,
+            next_cursor=encode_cursor(*pairs[-1][0]) if has_next else None,
+            previous_cursor=(
+                encode_cursor(*pairs[0][0]) if has_previous else None
+            ),
+        )
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Сливает несколько лент, отсортированных по (created, id), в одну.
+
+    Каждый источник отдаёт не больше страницы записей за курсором,
+    дальше работает k-way merge, поэтому страница стоит k коротких
+    выборок по индексу. Записи с одинаковым ключом считаются одной.
+    """
+
+    def __init__(self, paginators, per_page):
+        super().__init__([], per_page)
+        self.paginators = paginators
+
+    def fetch(self, after=None, before=None):
+        merged = heapq.merge(
+            *(
+                paginator.fetch(after=after, before=before)
+                for paginator in self.paginators
+            ),
+            key=itemgetter(0),
+            reverse=(not before) == self.descending,
+        )
+        pairs = []
+        for key, obj in merged:
+            if pairs and pairs[-1][0] == key:
+                continue
+            pairs.append((key, obj))
+            if len(pairs) > self.per_page:
+                break
+        return pairs
@@ -0,0 +1,32 @@
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+
+MARKER = '<!--personal:{}-->'
+MARKER_RE = re.compile(rb'<!--personal:([A-Za-z0-9_=-]+)-->')
+
+
+def marker(template_name, kwargs):
+    """Метка на месте персонального фрагмента в общей копии страницы."""
+    payload = json.dumps([template_name, kwargs], separators=(',', ':'))
+    return MARKER.format(
+        base64.urlsafe_b64encode(payload.encode()).decode()
+    )
+
+
+def render_fragment(request, template_name, kwargs):
+    return render_to_string(template_name, kwargs, request=request)
+
+
+def fill(request, response):
+    """Подставляет в ответ фрагменты, отрисованные для request.user."""
+    def replace(match):
+        template_name, kwargs = json.loads(
+            base64.urlsafe_b64decode(match.group(1))
+        )
+        return render_fragment(request, template_name, kwargs).encode()
+
+    response.content = MARKER_RE.sub(replace, response.content)
+    return response
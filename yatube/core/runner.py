@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def temp_cache(directory):
+    """override_settings, переносящий файлы кэша в directory.
+
+    В тестах много cache.clear(), а общий кэш сайта хранит и сессии.
+    """
+    return override_settings(CACHES={
+        alias: {
+            **config,
+            'LOCATION': os.path.join(directory, f'{alias}.sqlite3'),
+        }
+        for alias, config in settings.CACHES.items()
+    })
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты с кэшем во временном каталоге."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='yatube-cache-')
+        self.cache_settings = temp_cache(self.cache_dir)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
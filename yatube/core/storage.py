@@ -0,0 +1,35 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файлы под именем из хэша содержимого.
+
+    Файл из upload_to='posts/' с именем photo.jpg ляжет в
+    posts/ab/cd/abcd....jpg. Одинаковые загрузки получают одно имя и
+    записываются один раз, поэтому и миниатюры у них общие.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        try:
+            # Повторная загрузка обновляет mtime: сборщик мусора не
+            # трогает файлы моложе MEDIA_GC_GRACE_PERIOD, пока пост с
+            # ними ещё не закоммичен.
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            return super()._save(name, content)
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.personal import marker, render_fragment
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def personal(context, template_name, **kwargs):
+    """Выводит шаблон, зависящий от пользователя.
+
+    Если страница собирается как общая для всех копия, вместо шаблона
+    ставится метка, которую core.personal.fill() заменит при ответе.
+    Аргументы должны сериализоваться в JSON.
+    """
+    request = context.get('request')
+    if getattr(request, 'shared_render', False):
+        return mark_safe(marker(template_name, kwargs))
+    return mark_safe(render_fragment(request, template_name, kwargs))
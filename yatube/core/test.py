@@ -1,6 +1,12 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
+from django.conf import settings
+from django.test import TestCase, SimpleTestCase
 from http import HTTPStatus
 
+from .cache_backends import SQLiteCache
+
 
 class ViewTestClass(TestCase):
     def test_error_page(self):
@@ -8,3 +14,127 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_cache(self, **options):
+        return SQLiteCache(
+            os.path.join(self.directory.name, 'cache.sqlite3'),
+            {'OPTIONS': options},
+        )
+
+    def test_tests_use_own_cache_file(self):
+        '''Тесты пишут не в кэш работающего сайта.'''
+        self.assertNotEqual(
+            os.path.dirname(settings.CACHES['default']['LOCATION']),
+            settings.BASE_DIR,
+        )
+
+    def test_values_shared_between_instances(self):
+        '''Значения видны другому экземпляру с тем же файлом.'''
+        self.cache.set_many({'a': 1, 'b': [2]})
+        other = self.make_cache()
+        self.assertEqual(other.get_many(['a', 'b', 'c']), {'a': 1, 'b': [2]})
+        other.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_add_and_incr(self):
+        '''add не перезаписывает живое значение, incr атомарно прибавляет.'''
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_values(self):
+        '''Просроченные значения не отдаются и уступают место add.'''
+        self.cache.set('key', 'old', -1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_lru_eviction(self):
+        '''При переполнении вытесняются давно не читанные записи.'''
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=4, ACCESS_RESOLUTION=0
+        )
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+            time.sleep(0.01)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(set(cache.get_many('abcd')), {'a', 'c', 'd'})
+
+
+class ServeMediaTest(SimpleTestCase):
+    content = bytes(range(256)) * 4
+    hashed = 'posts/ab/cd/' + 'abcd' * 16 + '.jpg'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = self.settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for name in ('posts/old.jpg', self.hashed):
+            path = os.path.join(directory.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(self.content)
+
+    def test_full_file_and_not_modified(self):
+        '''Файл отдаётся потоком, а по ETag - ответом 304.'''
+        response = self.client.get('/media/posts/old.jpg')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response = self.client.get(
+            '/media/posts/old.jpg', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_range(self):
+        '''Range отдаёт кусок файла, а диапазон за концом - 416.'''
+        response = self.client.get(
+            '/media/posts/old.jpg', HTTP_RANGE='bytes=10-19'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(
+            b''.join(response.streaming_content), self.content[10:20]
+        )
+        response = self.client.get(
+            '/media/posts/old.jpg', HTTP_RANGE='bytes=-4'
+        )
+        self.assertEqual(
+            b''.join(response.streaming_content), self.content[-4:]
+        )
+        response = self.client.get(
+            '/media/posts/old.jpg', HTTP_RANGE='bytes=5000-'
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    def test_hashed_immutable_and_sendfile(self):
+        '''Файлы с хэшем кэшируются навсегда; тело может отдать nginx.'''
+        with self.settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect'):
+            response = self.client.get('/media/' + self.hashed)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/' + self.hashed
+        )
+        self.assertEqual(response.content, b'')
+
+    def test_outside_media_root(self):
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,162 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from core.cache import bump, get_versions
+from .models import Group, User
+
+VERSION = 'autocomplete'
+# Правка хранится в кэше, пока её могут не забрать другие процессы.
+CHANGE_TIMEOUT = 60 * 60
+
+
+def _change_key(version):
+    return f'{VERSION}:change:{version}'
+
+
+class PrefixIndex:
+    """Отсортированный массив ключей для поиска по префиксу.
+
+    Записи (ключ, тип, pk, подпись, адрес) лежат по возрастанию ключа,
+    поэтому все ключи с префиксом идут подряд от bisect_left(префикс).
+    Индекс строится один раз на процесс и обновляется сигналами.
+    Каждая правка кладётся в кэш под новой общей версией; другие
+    процессы не реже чем раз в AUTOCOMPLETE_REFRESH секунд забирают
+    пропущенные правки и применяют их по порядку. Целиком индекс
+    перестраивается, только если правок слишком много или часть уже
+    вытеснена из кэша.
+    """
+
+    def __init__(self):
+        self._entries = None
+        self._by_object = {}
+        self._version = None
+        self._checked = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _user_entries(user):
+        url = reverse('posts:profile', args=(user.username,))
+        return [(user.username.lower(), 'user', user.pk, user.username, url)]
+
+    @staticmethod
+    def _group_entries(group):
+        url = reverse('posts:group_list', args=(group.slug,))
+        return [
+            (key.lower(), 'group', group.pk, group.title, url)
+            for key in {group.title, group.slug}
+        ]
+
+    def _load(self):
+        entries = []
+        for user in User.objects.only('pk', 'username').iterator():
+            entries += self._user_entries(user)
+        for group in Group.objects.only('pk', 'title', 'slug').iterator():
+            entries += self._group_entries(group)
+        entries.sort()
+        by_object = {}
+        for entry in entries:
+            by_object.setdefault(entry[1:3], []).append(entry)
+        return entries, by_object
+
+    @staticmethod
+    def _changes(current, version):
+        """Правки после версии current или None, если их не собрать."""
+        if current is None or not (
+            0 < version - current <= settings.AUTOCOMPLETE_MAX_CHANGES
+        ):
+            return None
+        keys = [
+            _change_key(number) for number in range(current + 1, version + 1)
+        ]
+        found = cache.get_many(keys)
+        if len(found) != len(keys):
+            return None
+        return [found[key] for key in keys]
+
+    def _refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._entries is not None and (
+                now - self._checked < settings.AUTOCOMPLETE_REFRESH
+            ):
+                return
+            self._checked = now
+            current = self._version
+        # Версию читаем до загрузки: правки, попавшие между ними,
+        # применятся ещё раз при следующей сверке, а это безвредно.
+        version, = get_versions([VERSION])
+        if self._entries is not None and version == current:
+            return
+        changes = self._changes(current, version)
+        if changes is None:
+            # Таблицы читаются без блокировки, поиск не ждёт загрузки.
+            entries, by_object = self._load()
+            with self._lock:
+                self._entries, self._by_object = entries, by_object
+                self._version = version
+            return
+        with self._lock:
+            for change in changes:
+                self._replace(*change)
+            self._version = version
+
+    def _replace(self, kind, pk, entries):
+        for entry in self._by_object.pop((kind, pk), ()):
+            index = bisect_left(self._entries, entry)
+            if index < len(self._entries) and self._entries[index] == entry:
+                del self._entries[index]
+        for entry in entries:
+            insort(self._entries, entry)
+        if entries:
+            self._by_object[(kind, pk)] = entries
+
+    def _changed(self, kind, pk, entries):
+        version, = bump(VERSION)
+        cache.set(_change_key(version), (kind, pk, entries), CHANGE_TIMEOUT)
+        # Свою правку применяем сразу, но версию не двигаем: правки
+        # других процессов между прошлой сверкой и этой ещё не забраны.
+        with self._lock:
+            if self._entries is not None:
+                self._replace(kind, pk, entries)
+
+    def user_changed(self, user):
+        self._changed('user', user.pk, self._user_entries(user))
+
+    def user_deleted(self, user):
+        self._changed('user', user.pk, [])
+
+    def group_changed(self, group):
+        self._changed('group', group.pk, self._group_entries(group))
+
+    def group_deleted(self, group):
+        self._changed('group', group.pk, [])
+
+    def search(self, prefix, limit=None):
+        """Возвращает до limit объектов, ключ которых начинается с prefix."""
+        prefix = prefix.strip().lower()
+        limit = limit or settings.AUTOCOMPLETE_LIMIT
+        if not prefix:
+            return []
+        self._refresh()
+        with self._lock:
+            entries = self._entries
+            index = bisect_left(entries, (prefix,))
+            found = {}
+            while (
+                index < len(entries) and len(found) < limit
+                and entries[index][0].startswith(prefix)
+            ):
+                key, kind, pk, label, url = entries[index]
+                found.setdefault((kind, pk), {
+                    'type': kind, 'label': label, 'url': url,
+                })
+                index += 1
+        return list(found.values())
+
+
+index = PrefixIndex()
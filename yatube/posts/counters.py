@@ -0,0 +1,58 @@
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, UserStats
+
+COUNTED = {
+    'posts_count': (Post, 'author_id'),
+    'comments_count': (Comment, 'author_id'),
+    'followers_count': (Follow, 'author_id'),
+    'following_count': (Follow, 'user_id'),
+}
+
+
+def bump(user_id, **deltas):
+    """Сдвигает счётчики пользователя на deltas одним UPDATE.
+
+    Вызывается из сигналов, поэтому попадает в транзакцию записи, если
+    она открыта: views создают посты, комментарии и подписки внутри
+    atomic. Строку не создаёт: при каскадном удалении пользователя её
+    уже может не быть, а пропуски чинит команда rebuild_counters.
+    """
+    UserStats.objects.filter(user_id=user_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def count_for(user_ids):
+    """Считает счётчики по таблицам для пачки пользователей."""
+    counts = {
+        user_id: dict.fromkeys(COUNTED, 0) for user_id in user_ids
+    }
+    for field, (model, user_field) in COUNTED.items():
+        rows = model.objects.filter(
+            **{f'{user_field}__in': user_ids}
+        ).values(user_field).annotate(total=Count('pk')).order_by()
+        for row in rows:
+            counts[row[user_field]][field] = row['total']
+    return counts
+
+
+def stats_for(user):
+    """Возвращает счётчики пользователя, при отсутствии пересчитывает.
+
+    Читает строку запросом, а не через user.stats: пользователь может
+    прийти из кэша, где связанный объект уже закэширован устаревшим.
+    """
+    stats = UserStats.objects.filter(user_id=user.pk).first()
+    if stats is None:
+        stats, _ = UserStats.objects.update_or_create(
+            user_id=user.pk, defaults=count_for([user.pk])[user.pk]
+        )
+    return stats
+
+
+def bump_comments(post_id, delta):
+    """Сдвигает сохранённое число комментариев поста."""
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
@@ -0,0 +1,100 @@
+import csv
+import json
+
+from django.conf import settings
+
+from .models import Comment, Post
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Имя колонки выгрузки и поле для values_list. Колонки постов совпадают
+# с теми, что читает import_posts.
+FIELDS = {
+    'posts': {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'created': 'created',
+        'text': 'text',
+    },
+    'comments': {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'created': 'created',
+        'text': 'text',
+    },
+}
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку, а не пишет её."""
+
+    def write(self, value):
+        return value
+
+
+def queryset(kind, author=None, group=None):
+    """Посты автора или группы либо комментарии к ним."""
+    filters = {}
+    if author is not None:
+        filters['author'] = author
+    if group is not None:
+        filters['group'] = group
+    if kind == 'comments':
+        filters = {f'post__{name}': value for name, value in filters.items()}
+        return Comment.objects.filter(**filters)
+    return Post.objects.filter(**filters)
+
+
+def rows(kind, author=None, group=None):
+    """Кортежи значений, из базы читаются пачками по EXPORT_CHUNK_SIZE.
+
+    values_list не создаёт объектов моделей, а iterator() не копит
+    прочитанное в кэше queryset, поэтому память не растёт с выгрузкой.
+    """
+    return queryset(kind, author, group).order_by('pk').values_list(
+        *FIELDS[kind].values()
+    ).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def _values(row):
+    return [
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in row
+    ]
+
+
+def _jsonl(names, rows):
+    for row in rows:
+        yield json.dumps(
+            dict(zip(names, _values(row))), ensure_ascii=False
+        ) + '\n'
+
+
+def _csv(names, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(names)
+    for row in rows:
+        yield writer.writerow(_values(row))
+
+
+def render(kind, format, author=None, group=None):
+    """Генератор текста выгрузки в формате format.
+
+    Строки склеиваются по EXPORT_CHUNK_SIZE, чтобы не отдавать
+    серверу отдельный кусок на каждую запись.
+    """
+    names = list(FIELDS[kind])
+    render_rows = _csv if format == 'csv' else _jsonl
+    buffer = []
+    for line in render_rows(names, rows(kind, author, group)):
+        buffer.append(line)
+        if len(buffer) >= settings.EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,170 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import FeedReleaseTask, Follow, Post, TimelineEntry, UserStats
+
+PULLED_AUTHORS_KEY = 'feeds:pulled_authors'
+
+
+def pulled_authors():
+    """Авторы, чьи посты не раскладываются по лентам, а подмешиваются
+    при чтении: у них больше FEED_PUSH_THRESHOLD подписчиков."""
+    authors = cache.get(PULLED_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(
+            UserStats.objects.filter(
+                feed_pulled_since__isnull=False
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(
+            PULLED_AUTHORS_KEY, authors, settings.FEED_PULLED_AUTHORS_TIMEOUT
+        )
+    return authors
+
+
+def update_pulled(author_id):
+    """Переключает автора между раскладкой и подмешиванием постов.
+
+    Переход к подмешиванию дешёвый и делается сразу условным UPDATE,
+    так что при гонке его выполнит один процесс. Обратный переход
+    требует дописать в ленты подписчиков посты за время подмешивания,
+    поэтому он только ставится в очередь команды feed_worker.
+    """
+    stats = UserStats.objects.filter(user_id=author_id)
+    if stats.filter(
+        feed_pulled_since__isnull=True,
+        followers_count__gt=settings.FEED_PUSH_THRESHOLD,
+    ).update(feed_pulled_since=timezone.now()):
+        cache.delete(PULLED_AUTHORS_KEY)
+    elif stats.filter(
+        feed_pulled_since__isnull=False,
+        followers_count__lte=settings.FEED_PUSH_RELEASE_THRESHOLD,
+    ).exists():
+        FeedReleaseTask.objects.update_or_create(author_id=author_id)
+
+
+def release(task):
+    """Возвращает автора из очереди к раскладке и снимает задачу.
+
+    Посты за время подмешивания дописываются в ленты, пока автор ещё
+    подмешивается при чтении, поэтому из /follow/ они не пропадают.
+    Посты, написанные за время дозаполнения, дописываются вторым
+    проходом после снятия флага. Если подписчиков снова стало больше
+    порога, автор остаётся подмешиваемым.
+    """
+    stats = UserStats.objects.filter(
+        user_id=task.author_id,
+        followers_count__lte=settings.FEED_PUSH_RELEASE_THRESHOLD,
+    )
+    since = stats.values_list('feed_pulled_since', flat=True).first()
+    if since is not None:
+        started = timezone.now()
+        _backfill_followers(task.author_id, since)
+        if stats.filter(feed_pulled_since=since).update(
+            feed_pulled_since=None
+        ):
+            cache.delete(PULLED_AUTHORS_KEY)
+            _backfill_followers(task.author_id, started)
+    FeedReleaseTask.objects.filter(
+        pk=task.pk, created=task.created
+    ).delete()
+
+
+def _backfill_followers(author_id, since):
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    # Подписавшиеся после since не получили и обычного backfill.
+    _backfill(
+        followers.filter(created__lt=since).iterator(), author_id, since
+    )
+    _backfill(followers.filter(created__gte=since).iterator(), author_id)
+
+
+def followed_pulled_authors(user):
+    """Авторы из pulled_authors(), на которых подписан пользователь."""
+    authors = pulled_authors()
+    if not authors:
+        return []
+    return list(
+        Follow.objects.filter(user=user, author_id__in=authors).values_list(
+            'author_id', flat=True
+        )
+    )
+
+
+def as_posts(objects):
+    """Превращает записи ленты в посты, посты оставляет как есть."""
+    return [
+        obj.post if isinstance(obj, TimelineEntry) else obj
+        for obj in objects
+    ]
+
+
+def _entry(user_id, post):
+    return TimelineEntry(
+        user_id=user_id,
+        post=post,
+        author_id=post.author_id,
+        created=post.created,
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_many([post])
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку новых постов по лентам подписчиков авторов."""
+    pulled = pulled_authors()
+    by_author = defaultdict(list)
+    for post in posts:
+        if post.author_id not in pulled:
+            by_author[post.author_id].append(post)
+    if not by_author:
+        return
+    followers = Follow.objects.filter(author_id__in=by_author).values_list(
+        'author_id', 'user_id'
+    )
+    batch = []
+    for author_id, user_id in followers.iterator():
+        for post in by_author[author_id]:
+            batch.append(_entry(user_id, post))
+            if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+                TimelineEntry.objects.bulk_create(
+                    batch, ignore_conflicts=True
+                )
+                batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if author_id in pulled_authors():
+        return
+    _backfill([user_id], author_id)
+
+
+def _backfill(user_ids, author_id, since=None):
+    posts = Post.objects.filter(author_id=author_id).only(
+        'id', 'author_id', 'created'
+    )
+    if since is not None:
+        posts = posts.filter(created__gte=since)
+    posts = list(posts[:settings.TIMELINE_BACKFILL])
+    batch = []
+    for user_id in user_ids:
+        batch.extend(_entry(user_id, post) for post in posts)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
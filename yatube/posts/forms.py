@@ -1,5 +1,7 @@
-from django.forms import ModelForm
+from django.core.files.uploadedfile import UploadedFile
+from django.forms import ModelForm, ValidationError
 
+from .images import ingest
 from .models import Post, Comment
 
 
@@ -8,6 +10,23 @@ class PostForm(ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        self.image_size = (None, None)
+        if isinstance(image, UploadedFile):
+            try:
+                image, self.image_size = ingest(image)
+            except OSError:
+                raise ValidationError('Не удалось прочитать картинку.')
+        return image
+
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            self.instance.image_width, self.instance.image_height = (
+                self.image_size
+            )
+        return super().save(commit)
+
 
 class CommentForm(ModelForm):
     class Meta:
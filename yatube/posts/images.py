@@ -0,0 +1,56 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def _output_format(has_alpha):
+    if features.check('webp'):
+        return 'WEBP'
+    return 'PNG' if has_alpha else 'JPEG'
+
+
+def ingest(upload):
+    """Готовит загруженную картинку к хранению.
+
+    Уменьшает её до POST_IMAGE_MAX_SIZE по длинной стороне, поворачивает
+    по EXIF и пересохраняет без метаданных в WebP, а если Pillow собран
+    без него - в JPEG (PNG для картинок с прозрачностью). Анимированные
+    картинки сохраняются как есть. Возвращает файл и его размеры.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return upload, image.size
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    # JPEG умеет декодироваться сразу в уменьшенном в 2-8 раз виде.
+    image.draft('RGB', (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    has_alpha = _has_alpha(image)
+    image_format = _output_format(has_alpha)
+    image = image.convert(
+        'RGBA' if has_alpha and image_format != 'JPEG' else 'RGB'
+    )
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        image_format,
+        quality=settings.POST_IMAGE_QUALITY,
+        optimize=True,
+        progressive=True,
+    )
+    name = '{}.{}'.format(
+        os.path.splitext(os.path.basename(upload.name))[0],
+        image_format.lower().replace('jpeg', 'jpg'),
+    )
+    return ContentFile(buffer.getvalue(), name=name), image.size
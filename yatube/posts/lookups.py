@@ -0,0 +1,6 @@
+from core.cache import ObjectCache
+
+from .models import Group, User
+
+groups = ObjectCache(Group, 'slug')
+users = ObjectCache(User, 'username')
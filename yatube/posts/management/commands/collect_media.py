@@ -0,0 +1,89 @@
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+# Проход и последнее обработанное в нём имя.
+CHECKPOINT_KEY = 'media-gc:position'
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, вместе '
+        'с их миниатюрами, а также миниатюры и ключи пропавших картинок '
+        'и файлы миниатюр без ключей. Работает пачками и продолжает с '
+        'места остановки, поэтому её можно запускать по cron с '
+        '--max-seconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько файлов сверять с базой за один запрос.',
+        )
+        parser.add_argument(
+            '--max-seconds', type=float, default=0,
+            help='Остановиться после этого времени; 0 - без ограничения.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать обход заново, а не с сохранённого места.',
+        )
+
+    def chunks(self, start, after, chunk_size):
+        """Пачки имён всех проходов, начиная с прохода start после after."""
+        passes = list(media.PASSES)
+        for name in passes[passes.index(start):]:
+            iterate, sweep = media.PASSES[name]
+            files = iterate(after)
+            after = ''
+            while True:
+                names = list(islice(files, chunk_size))
+                if not names:
+                    break
+                yield name, sweep, names
+
+    def handle(self, *args, dry_run, chunk_size, max_seconds, restart,
+               **options):
+        checkpoint = None if restart else cache.get(CHECKPOINT_KEY)
+        start, after = checkpoint or (next(iter(media.PASSES)), '')
+        if after:
+            self.stdout.write(f'Продолжаю после {after}.')
+        grace_period = timedelta(seconds=settings.MEDIA_GC_GRACE_PERIOD)
+        started = time.monotonic()
+        scanned = removed = reclaimed = fixed = 0
+        finished = False
+        for name, sweep, names in self.chunks(start, after, chunk_size):
+            orphans, wrong = sweep(names, grace_period, dry_run)
+            for orphan, size in orphans:
+                self.stdout.write(f'{orphan} ({size} байт)')
+            scanned += len(names)
+            removed += len(orphans)
+            reclaimed += sum(size for orphan, size in orphans)
+            fixed += wrong
+            if not dry_run:
+                cache.set(CHECKPOINT_KEY, (name, names[-1]), None)
+            if max_seconds and time.monotonic() - started > max_seconds:
+                break
+        else:
+            finished = True
+        if finished and not dry_run:
+            cache.delete(CHECKPOINT_KEY)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        action = 'Можно удалить' if dry_run else 'Удалено'
+        self.stdout.write(
+            f'Проверено файлов: {scanned}. {action}: {removed} '
+            f'({reclaimed / 2**20:.1f} МБ), исправлено счётчиков: {fixed}. '
+            f'{elapsed:.1f} с, {scanned / elapsed:.0f} файлов/с.'
+        )
+        if not finished:
+            self.stdout.write('Обход не закончен, следующий запуск продолжит.')
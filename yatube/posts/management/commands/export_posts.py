@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export, lookups
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты или комментарии к ним в JSON Lines или CSV. '
+        'Читает базу пачками, поэтому память не растёт с объёмом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', help='Имя автора постов.')
+        parser.add_argument('--group', help='Slug группы постов.')
+        parser.add_argument(
+            '--kind', choices=sorted(export.FIELDS), default='posts',
+            help='Что выгружать: посты или комментарии к ним.',
+        )
+        parser.add_argument(
+            '--format', choices=sorted(export.FORMATS), default='jsonl',
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; по умолчанию stdout.',
+        )
+
+    def handle(self, *args, author, group, kind, format, output, **options):
+        filters = {}
+        if author:
+            filters['author'] = lookups.users.get(author)
+            if filters['author'] is None:
+                raise CommandError(f'Нет пользователя {author!r}.')
+        if group:
+            filters['group'] = lookups.groups.get(group)
+            if filters['group'] is None:
+                raise CommandError(f'Нет группы {group!r}.')
+        chunks = export.render(kind, format, **filters)
+        if output is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(output, 'w', encoding='utf-8', newline='') as file:
+            file.writelines(chunks)
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import feeds
+from posts.models import FeedReleaseTask
+
+
+class Command(BaseCommand):
+    help = (
+        'Возвращает авторов из очереди к раскладке постов по лентам '
+        'и дописывает подписчикам их посты за время подмешивания.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти, а не ждать новых задач.',
+        )
+
+    def handle(self, *args, once, **options):
+        failed = set()
+        while True:
+            task = FeedReleaseTask.objects.exclude(pk__in=failed).first()
+            if task is None:
+                if once:
+                    break
+                time.sleep(settings.FEED_WORKER_INTERVAL)
+                continue
+            try:
+                feeds.release(task)
+            except Exception as error:
+                # Задача остаётся в очереди до перезапуска воркера.
+                failed.add(task.pk)
+                self.stderr.write(f'author {task.pk}: {error}')
+        self.stdout.write('Очередь раскладки лент разобрана.')
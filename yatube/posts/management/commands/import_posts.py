@@ -0,0 +1,191 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import counters, feeds, lookups, tags
+from posts.models import ImportCheckpoint, Post
+from posts.signals import invalidate_feeds
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_jsonl(file):
+    # Ошибку отдаём значением: генератор после исключения не продолжить.
+    for line in file:
+        if not line.strip():
+            yield None
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            row = RowError(f'неверный JSON: {error}')
+        if not isinstance(row, (dict, RowError)):
+            row = RowError('ожидается объект JSON')
+        yield row
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+def parse_created(value):
+    if not value:
+        return None
+    created = parse_datetime(value)
+    if created is None:
+        raise RowError(f'неверная дата {value!r}')
+    if timezone.is_naive(created):
+        created = timezone.make_aware(created)
+    return created
+
+
+def build_post(row):
+    """Собирает несохранённый пост из строки источника."""
+    if isinstance(row, RowError):
+        raise row
+    text = row.get('text')
+    if not isinstance(text, str) or not text.strip():
+        raise RowError('пустой текст')
+    author = lookups.users.get(row.get('author') or '')
+    if author is None:
+        raise RowError(f'нет автора {row.get("author")!r}')
+    group = None
+    if row.get('group'):
+        group = lookups.groups.get(row['group'])
+        if group is None:
+            raise RowError(f'нет группы {row["group"]!r}')
+    post = Post(text=text, author=author, group=group)
+    post.legacy_created = parse_created(row.get('created'))
+    return post
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты из JSONL или CSV с полями author, text, group '
+        'и created. Пишет пачками и продолжает с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с постами; - читает стандартный ввод.',
+        )
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='Формат файла; по умолчанию по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк записывать за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--source',
+            help='Имя источника для позиции; по умолчанию путь к файлу.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с первой строки, а не с сохранённой позиции.',
+        )
+
+    def handle(self, *args, path, format, batch_size, source, restart,
+               **options):
+        if format is None:
+            format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        if source is None:
+            source = 'stdin' if path == '-' else os.path.abspath(path)
+        if restart:
+            ImportCheckpoint.objects.filter(source=source).delete()
+        checkpoint = ImportCheckpoint.objects.filter(source=source).first()
+        position = checkpoint.position if checkpoint else 0
+        if position:
+            self.stdout.write(f'Продолжаю после строки {position}.')
+        try:
+            file = (
+                sys.stdin if path == '-'
+                else open(path, encoding='utf-8', newline='')
+            )
+        except OSError as error:
+            raise CommandError(error)
+        with file:
+            rows = enumerate(READERS[format](file), 1)
+            # Уже загруженные строки пропускаем без записи в базу.
+            for _ in islice(rows, position):
+                pass
+            self.import_rows(rows, source, batch_size)
+
+    def import_rows(self, rows, source, batch_size):
+        started = time.monotonic()
+        read = imported = skipped = 0
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            posts = []
+            for number, row in chunk:
+                if row is None:
+                    continue
+                try:
+                    posts.append(build_post(row))
+                except RowError as error:
+                    self.stderr.write(f'Строка {number}: {error}.')
+                    skipped += 1
+            self.save_chunk(posts, source, chunk[-1][0])
+            read += len(chunk)
+            imported += len(posts)
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f'Строка {chunk[-1][0]}: загружено {imported}, '
+                f'{read / elapsed:.0f} строк/с.'
+            )
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'Прочитано строк: {read}, загружено постов: {imported}, '
+            f'пропущено: {skipped}. {elapsed:.1f} с, '
+            f'{read / elapsed:.0f} строк/с.'
+        )
+
+    def save_chunk(self, posts, source, position):
+        """Пишет пачку постов вместе с тем, что делают их сигналы."""
+        with transaction.atomic():
+            for post in posts:
+                post.render_text()
+            Post.objects.bulk_create(posts)
+            if posts and posts[0].pk is None:
+                # SQLite не возвращает ключи из bulk_create. Внутри
+                # транзакции на запись чужих вставок нет, так что
+                # последние ключи таблицы - наши.
+                pks = list(Post.objects.order_by('-pk').values_list(
+                    'pk', flat=True
+                )[:len(posts)])
+                for post, pk in zip(posts, reversed(pks)):
+                    post.pk = pk
+            # auto_now_add перезаписал даты при вставке, возвращаем их.
+            dated = [post for post in posts if post.legacy_created]
+            for post in dated:
+                post.created = post.legacy_created
+            Post.objects.bulk_update(dated, ['created'])
+            tags.create_for(posts)
+            feeds.fan_out_many(posts)
+            per_author = Counter(post.author_id for post in posts)
+            for author_id, count in per_author.items():
+                counters.bump(author_id, posts_count=count)
+            ImportCheckpoint.objects.update_or_create(
+                source=source, defaults={'position': position}
+            )
+        invalidate_feeds(
+            group_ids={post.group_id for post in posts},
+            usernames={post.author.username for post in posts},
+        )
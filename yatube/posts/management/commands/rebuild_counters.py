@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.counters import COUNTED, count_for
+from posts.models import UserStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики пользователей пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько пользователей обрабатывать за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сверить счётчики и вывести расхождения.',
+        )
+
+    def handle(self, *args, chunk_size, verify, **options):
+        checked = mismatched = 0
+        last_pk = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+            mismatched += self.process_chunk(user_ids, verify)
+            checked += len(user_ids)
+        self.stdout.write(
+            f'Проверено пользователей: {checked}, '
+            f'расхождений: {mismatched}.'
+        )
+        if verify and mismatched:
+            raise CommandError('Счётчики расходятся с данными.')
+
+    def process_chunk(self, user_ids, verify):
+        counts = count_for(user_ids)
+        with transaction.atomic():
+            stored = UserStats.objects.select_for_update().in_bulk(user_ids)
+            stale = [
+                user_id for user_id, values in counts.items()
+                if user_id not in stored
+                or any(
+                    getattr(stored[user_id], field) != value
+                    for field, value in values.items()
+                )
+            ]
+            for user_id in stale:
+                self.stdout.write(f'user {user_id}: {counts[user_id]}')
+            if verify or not stale:
+                return len(stale)
+            UserStats.objects.bulk_create([
+                UserStats(user_id=user_id, **counts[user_id])
+                for user_id in stale if user_id not in stored
+            ])
+            to_update = [
+                UserStats(user_id=user_id, **counts[user_id])
+                for user_id in stale if user_id in stored
+            ]
+            UserStats.objects.bulk_update(to_update, list(COUNTED))
+        return len(stale)
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import ThumbnailTask
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для постов из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти, а не ждать новых задач.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько задач забирать из базы за один запрос.',
+        )
+
+    def handle(self, *args, once, batch_size, **options):
+        failed = set()
+        while True:
+            tasks = list(
+                ThumbnailTask.objects.exclude(pk__in=failed)
+                .select_related('post__author')[:batch_size]
+            )
+            if not tasks:
+                if once:
+                    break
+                time.sleep(settings.THUMBNAIL_WORKER_INTERVAL)
+                continue
+            for task in tasks:
+                try:
+                    thumbnails.process(task)
+                except Exception as error:
+                    # Задача остаётся в очереди до перезапуска воркера.
+                    failed.add(task.pk)
+                    self.stderr.write(f'post {task.pk}: {error}')
+        self.stdout.write('Очередь миниатюр разобрана.')
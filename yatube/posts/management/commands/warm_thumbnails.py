@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры картинок всех постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько постов читать из базы за один запрос.',
+        )
+
+    def handle(self, *args, chunk_size, **options):
+        checked = created = 0
+        last_pk = 0
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last_pk).exclude(image='')
+                .select_related('author').order_by('pk')
+                .only('image', 'group_id', 'author__username')[:chunk_size]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            for post in posts:
+                if thumbnails.generate(post):
+                    post.save(update_fields=['modified'])
+                    created += 1
+            checked += len(posts)
+        self.stdout.write(
+            f'Проверено постов: {checked}, '
+            f'созданы миниатюры для: {created}.'
+        )
@@ -0,0 +1,141 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .models import MediaFile, Post
+
+storage = Post._meta.get_field('image').storage
+upload_to = Post._meta.get_field('image').upload_to
+thumbnail_dir = sorl_settings.THUMBNAIL_PREFIX.rstrip('/')
+
+
+def change_refs(name, delta):
+    """Сдвигает счётчик ссылок на файл картинки name."""
+    if not name:
+        return
+    with transaction.atomic():
+        MediaFile.objects.get_or_create(name=name)
+        MediaFile.objects.filter(name=name).update(refs=F('refs') + delta)
+
+
+def image_changed(previous, current):
+    if previous != current:
+        change_refs(current, 1)
+        change_refs(previous, -1)
+
+
+def iter_files(after='', directory=upload_to.rstrip('/'), storage=storage):
+    """Файлы хранилища картинок по возрастанию имени, начиная после after.
+
+    Каталоги обходятся в том же порядке, что и строки имён, поэтому
+    обход можно прервать и продолжить с последнего имени.
+    """
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    entries = sorted(
+        [f'{name}/' for name in directories] + files
+    )
+    for entry in entries:
+        path = f'{directory}/{entry}'
+        if not entry.endswith('/'):
+            if path > after:
+                yield path
+        elif after.startswith(path):
+            yield from iter_files(after, path.rstrip('/'), storage)
+        elif path > after:
+            yield from iter_files('', path.rstrip('/'), storage)
+
+
+def sweep(names, grace_period, dry_run=False):
+    """Сверяет пачку файлов с постами и удаляет файлы без ссылок.
+
+    Файлы моложе grace_period не трогаются: пост с ними может быть ещё
+    не закоммичен. Счётчики MediaFile выравниваются по фактическим
+    ссылкам. Возвращает удалённые файлы с размерами и число
+    исправленных счётчиков.
+    """
+    refs = dict(
+        Post.objects.filter(image__in=names).order_by().values(
+            'image'
+        ).annotate(refs=Count('pk')).values_list('image', 'refs')
+    )
+    stale_before = timezone.now() - grace_period
+    orphans = [
+        name for name in names
+        if name not in refs and storage.get_modified_time(name) < stale_before
+    ]
+    removed = [(name, storage.size(name)) for name in orphans]
+    stored = MediaFile.objects.in_bulk(list(refs))
+    wrong = [
+        MediaFile(name=name, refs=count) for name, count in refs.items()
+        if name not in stored or stored[name].refs != count
+    ]
+    if dry_run:
+        return removed, len(wrong)
+    with transaction.atomic():
+        MediaFile.objects.filter(name__in=orphans).delete()
+        MediaFile.objects.bulk_update(
+            [media for media in wrong if media.name in stored], ['refs']
+        )
+        MediaFile.objects.bulk_create(
+            [media for media in wrong if media.name not in stored]
+        )
+    for name in orphans:
+        # Вместе с исходником удаляются его миниатюры и их ключи.
+        default.kvstore.delete(ImageFile(name, storage))
+        storage.delete(name)
+    return removed, len(wrong)
+
+
+def iter_sources(after=''):
+    """Ключи исходников с миниатюрами, начиная после after."""
+    return default.kvstore.iter_sources(after)
+
+
+def sweep_sources(keys, grace_period, dry_run=False):
+    """Удаляет миниатюры и ключи картинок, файлов которых уже нет.
+
+    Так вычищается то, что осталось после удаления исходника в обход
+    sweep. Счётчиков ссылок здесь нет, поэтому исправленных ноль.
+    """
+    return default.kvstore.prune(keys, dry_run), 0
+
+
+def iter_thumbnails(after=''):
+    """Файлы каталога миниатюр по возрастанию имени, начиная после after."""
+    return iter_files(after, thumbnail_dir, default.storage)
+
+
+def sweep_thumbnails(names, grace_period, dry_run=False):
+    """Удаляет файлы миниатюр, о которых не знает хранилище ключей.
+
+    Файлы моложе grace_period не трогаются: sorl пишет ключ миниатюры
+    после её файла.
+    """
+    images = {name: ImageFile(name, default.storage) for name in names}
+    known = default.kvstore.get_many(list(images.values()))
+    stale_before = timezone.now() - grace_period
+    orphans = [
+        name for name, image in images.items()
+        if known[image.key] is None
+        and default.storage.get_modified_time(name) < stale_before
+    ]
+    removed = [(name, default.storage.size(name)) for name in orphans]
+    if not dry_run:
+        for name in orphans:
+            default.storage.delete(name)
+    return removed, 0
+
+
+# Проходы сборщика по порядку: имя, обход с места остановки и чистка
+# пачки. Ключи чистятся раньше каталога миниатюр, чтобы миниатюры
+# пропавших исходников ушли вместе со своими ключами.
+PASSES = {
+    'images': (iter_files, sweep),
+    'sources': (iter_sources, sweep_sources),
+    'thumbnails': (iter_thumbnails, sweep_thumbnails),
+}
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserStats = apps.get_model('posts', 'UserStats')
+    counted = {
+        'posts_count': (apps.get_model('posts', 'Post'), 'author_id'),
+        'comments_count': (apps.get_model('posts', 'Comment'), 'author_id'),
+        'followers_count': (apps.get_model('posts', 'Follow'), 'author_id'),
+        'following_count': (apps.get_model('posts', 'Follow'), 'user_id'),
+    }
+    stats = {
+        user_id: UserStats(user_id=user_id)
+        for user_id in User.objects.values_list('pk', flat=True)
+    }
+    for field, (model, user_field) in counted.items():
+        rows = model.objects.values(user_field).annotate(
+            total=models.Count('pk')
+        ).order_by()
+        for row in rows:
+            setattr(stats[row[user_field]], field, row['total'])
+    UserStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0008_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+
+def render_texts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'text').iterator(chunk_size=1000):
+        post.text_html = linebreaks(post.text, autoescape=True)
+        post.excerpt = Truncator(' '.join(post.text.split())).chars(
+            settings.POST_EXCERPT_LENGTH
+        )
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ('text_html', 'excerpt'))
+            batch = []
+    Post.objects.bulk_update(batch, ('text_html', 'excerpt'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст поста в HTML'),
+        ),
+        migrations.RunPython(render_texts, migrations.RunPython.noop),
+    ]
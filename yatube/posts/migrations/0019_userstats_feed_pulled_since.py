@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:40
+
+from datetime import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_pulled(apps, schema_editor):
+    # С какого момента посты авторов не раскладывались, неизвестно:
+    # берём давнюю дату, чтобы при выходе из подмешивания дозаполнить
+    # ленты последними постами целиком.
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gt=settings.FEED_PUSH_THRESHOLD
+    ).update(feed_pulled_since=datetime(1970, 1, 1, tzinfo=timezone.utc))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_pulled_since',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Посты подмешиваются в ленты с'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
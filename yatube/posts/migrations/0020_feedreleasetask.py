@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0019_userstats_feed_pulled_since'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedReleaseTask',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('created', models.DateTimeField(auto_now=True, verbose_name='Дата постановки')),
+            ],
+            options={
+                'verbose_name': 'Задача на раскладку ленты',
+                'verbose_name_plural': 'Задачи на раскладку лент',
+                'ordering': ('created',),
+            },
+        ),
+    ]
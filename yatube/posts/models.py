@@ -1,6 +1,10 @@
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
 
 User = get_user_model()
 
@@ -33,19 +37,67 @@ class Post(CreatedModel):
     )
     image = models.ImageField(
         upload_to="posts/",
+        storage=ContentAddressedStorage(),
         blank=True,
         verbose_name="Картинка",
         help_text="Добавить картинку к посту",
     )
+    image_width = models.PositiveIntegerField(
+        "Ширина картинки", null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        "Высота картинки", null=True, blank=True, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        "Комментариев", default=0, editable=False
+    )
+    modified = models.DateTimeField("Дата изменения", auto_now=True)
+    text_html = models.TextField(
+        "Текст поста в HTML", blank=True, editable=False
+    )
+    excerpt = models.CharField(
+        "Начало текста", max_length=255, blank=True, editable=False
+    )
 
     class Meta(CreatedModel.Meta):
-        ordering = ("-created",)
+        ordering = ("-created", "-id")
+        # Составные индексы под постраничный вывод по ключу (created, id).
+        indexes = (
+            models.Index(
+                fields=("-created", "-id"), name="post_created_id_idx"
+            ),
+            models.Index(
+                fields=("group", "-created", "-id"),
+                name="post_group_created_idx",
+            ),
+            models.Index(
+                fields=("author", "-created", "-id"),
+                name="post_author_created_idx",
+            ),
+        )
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'text_html', 'excerpt'
+                }
+        super().save(*args, **kwargs)
+
+    def render_text(self):
+        """Готовит экранированный HTML и начало текста для шаблонов."""
+        self.text_html = linebreaks(self.text, autoescape=True)
+        self.excerpt = Truncator(' '.join(self.text.split())).chars(
+            settings.POST_EXCERPT_LENGTH
+        )
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -64,6 +116,15 @@ class Comment(CreatedModel):
         "Комментарий", help_text="Введите текст комментария"
     )
 
+    class Meta(CreatedModel.Meta):
+        ordering = ("created", "id")
+        indexes = (
+            models.Index(
+                fields=("post", "created", "id"),
+                name="comment_post_created_idx",
+            ),
+        )
+
 
 class Follow(CreatedModel):
     user = models.ForeignKey(
@@ -78,3 +139,212 @@ class Follow(CreatedModel):
         related_name="following",
         verbose_name="Автор для подписки",
     )
+
+
+class TimelineEntry(models.Model):
+    """Запись в ленте подписок пользователя.
+
+    Лента заполняется при публикации поста (fan-out on write), поэтому
+    страница /follow/ читается одним диапазоном по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        verbose_name="Читатель",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор поста",
+    )
+    created = models.DateTimeField("Дата создания поста")
+
+    class Meta:
+        ordering = ("-created", "-post_id")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "post"), name="unique_timeline_entry"
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("user", "-created", "-post"),
+                name="timeline_user_created_idx",
+            ),
+            models.Index(
+                fields=("user", "author"), name="timeline_user_author_idx"
+            ),
+        )
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+
+
+class PostTag(models.Model):
+    """Хэштег из текста поста.
+
+    Дата поста продублирована, чтобы страница тега читалась диапазоном
+    по индексу (name, created, post).
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="tags",
+        verbose_name="Пост",
+    )
+    name = models.CharField("Тег", max_length=64)
+    created = models.DateTimeField("Дата создания поста")
+
+    class Meta:
+        ordering = ("-created", "-post_id")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("name", "post"), name="unique_post_tag"
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("name", "-created", "-post"),
+                name="post_tag_name_created_idx",
+            ),
+        )
+        verbose_name = "Тег поста"
+        verbose_name_plural = "Теги постов"
+
+
+class Mention(models.Model):
+    """Упоминание пользователя в тексте поста."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="mentions",
+        verbose_name="Пост",
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="mentions",
+        verbose_name="Упомянутый пользователь",
+    )
+    created = models.DateTimeField("Дата создания поста")
+
+    class Meta:
+        ordering = ("-created", "-post_id")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "post"), name="unique_mention"
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("user", "-created", "-post"),
+                name="mention_user_created_idx",
+            ),
+        )
+        verbose_name = "Упоминание"
+        verbose_name_plural = "Упоминания"
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые обновляются при записи.
+
+    Страницы профиля и поста берут числа отсюда, а не считают строки.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Пользователь",
+    )
+    posts_count = models.PositiveIntegerField("Постов", default=0)
+    comments_count = models.PositiveIntegerField("Комментариев", default=0)
+    followers_count = models.PositiveIntegerField(
+        "Подписчиков", default=0, db_index=True
+    )
+    following_count = models.PositiveIntegerField("Подписок", default=0)
+    feed_pulled_since = models.DateTimeField(
+        "Посты подмешиваются в ленты с", null=True, blank=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = "Счётчики пользователя"
+        verbose_name_plural = "Счётчики пользователей"
+
+
+class ThumbnailTask(models.Model):
+    """Пост, для картинки которого ещё не созданы миниатюры.
+
+    Очередь разбирает команда thumbnail_worker.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="+",
+        verbose_name="Пост",
+    )
+    created = models.DateTimeField("Дата постановки", auto_now=True)
+
+    class Meta:
+        ordering = ("created",)
+        verbose_name = "Задача на миниатюры"
+        verbose_name_plural = "Задачи на миниатюры"
+
+
+class FeedReleaseTask(models.Model):
+    """Автор, чьи посты пора снова раскладывать по лентам.
+
+    Пока задачу не разобрала команда feed_worker, автор остаётся
+    подмешиваемым, и его посты видны подписчикам.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="+",
+        verbose_name="Автор",
+    )
+    created = models.DateTimeField("Дата постановки", auto_now=True)
+
+    class Meta:
+        ordering = ("created",)
+        verbose_name = "Задача на раскладку ленты"
+        verbose_name_plural = "Задачи на раскладку лент"
+
+
+class MediaFile(models.Model):
+    """Сколько постов ссылается на файл из хранилища картинок.
+
+    Файлы без ссылок удаляет команда сборки мусора.
+    """
+    name = models.CharField("Имя файла", max_length=255, primary_key=True)
+    refs = models.IntegerField("Ссылок", default=0, db_index=True)
+    modified = models.DateTimeField("Дата изменения", auto_now=True)
+
+    class Meta:
+        verbose_name = "Файл картинки"
+        verbose_name_plural = "Файлы картинок"
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько строк источника уже загрузила команда import_posts.
+
+    Позиция сохраняется в той же транзакции, что и посты пачки, поэтому
+    после прерывания загрузка продолжается без пропусков и дублей.
+    """
+    source = models.CharField("Источник", max_length=255, primary_key=True)
+    position = models.BigIntegerField("Прочитано строк", default=0)
+    modified = models.DateTimeField("Дата изменения", auto_now=True)
+
+    class Meta:
+        verbose_name = "Позиция импорта"
+        verbose_name_plural = "Позиции импорта"
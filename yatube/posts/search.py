@@ -0,0 +1,156 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Post
+
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+# Триггеры, которые держат индекс в согласии с posts_post (их создаёт
+# миграция 0016). SQLite удаляет их вместе со старой таблицей, когда
+# схема пересобирает posts_post при изменении полей.
+TRIGGERS = {
+    'posts_post_fts_insert': (
+        "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post"
+        " BEGIN"
+        " INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);"
+        " END"
+    ),
+    'posts_post_fts_delete': (
+        "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post"
+        " BEGIN"
+        " INSERT INTO posts_post_fts(posts_post_fts, rowid, text)"
+        " VALUES ('delete', old.id, old.text);"
+        " END"
+    ),
+    'posts_post_fts_update': (
+        "CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text"
+        " ON posts_post BEGIN"
+        " INSERT INTO posts_post_fts(posts_post_fts, rowid, text)"
+        " VALUES ('delete', old.id, old.text);"
+        " INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);"
+        " END"
+    ),
+}
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def restore_triggers(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Обработчик post_migrate: возвращает пропавшие триггеры индекса.
+
+    Пока триггеров не было, индекс мог отстать от таблицы, поэтому
+    после их создания он пересобирается.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    if 'posts_post_fts' not in db.introspection.table_names():
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master"
+            " WHERE type = 'trigger' AND tbl_name = 'posts_post'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = [name for name in TRIGGERS if name not in existing]
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+        cursor.execute(
+            "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')"
+        )
+
+
+def match_query(query):
+    """Переводит ввод пользователя в запрос FTS5.
+
+    Каждое слово ищется по префиксу, все слова обязательны; служебный
+    синтаксис FTS5 из ввода не попадает в запрос.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+def filter_posts(queryset, query):
+    """Сужает queryset до постов, подходящих под query."""
+    match = match_query(query)
+    if not match:
+        return queryset.none()
+    if not fts_available():
+        for word in re.findall(r'\w+', query):
+            queryset = queryset.filter(text__icontains=word)
+        return queryset
+    return queryset.filter(pk__in=RawSQL(
+        'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+        (match,),
+    ))
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и оборачивает найденные слова в <mark>."""
+    return escape(snippet).replace(
+        SNIPPET_START, '<mark>'
+    ).replace(SNIPPET_END, '</mark>')
+
+
+class SearchResults:
+    """Посты по запросу в порядке релевантности (bm25).
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator:
+    каждая страница - один запрос к индексу и один к posts_post.
+    У постов есть атрибут snippet с подсвеченным фрагментом текста.
+    """
+
+    def __init__(self, query):
+        self.match = match_query(query)
+        self.query = query
+
+    def count(self):
+        if not self.match:
+            return 0
+        if not fts_available():
+            return filter_posts(Post.objects.all(), self.query).count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT count(*) FROM posts_post_fts '
+                'WHERE posts_post_fts MATCH %s',
+                (self.match,),
+            )
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, window):
+        if not self.match:
+            return []
+        if not fts_available():
+            posts = list(filter_posts(
+                Post.objects.select_related('author', 'group'), self.query
+            )[window])
+            for post in posts:
+                post.snippet = escape(post.excerpt)
+            return posts
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid, snippet(posts_post_fts, 0, %s, %s, %s, 16) '
+                'FROM posts_post_fts WHERE posts_post_fts MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                (
+                    SNIPPET_START, SNIPPET_END, '…', self.match,
+                    window.stop - window.start, window.start,
+                ),
+            )
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, snippet in rows]
+        )
+        found = []
+        for post_id, snippet in rows:
+            if post_id in posts:
+                posts[post_id].snippet = highlight(snippet)
+                found.append(posts[post_id])
+        return found
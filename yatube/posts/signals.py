@@ -0,0 +1,173 @@
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from core import cache
+from . import autocomplete, counters, feeds, lookups, media, tags
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def remember_previous(instance, *fields):
+    """Запоминает значения полей из базы до сохранения объекта."""
+    previous = None
+    if instance.pk:
+        previous = type(instance).objects.filter(pk=instance.pk).values(
+            *fields
+        ).first()
+    instance._previous = previous or {}
+
+
+def invalidate_feeds(group_ids=(), usernames=(), index=True):
+    """Сбрасывает версии закэшированных лент.
+
+    Внутри транзакции версии сбрасываются ещё раз после коммита:
+    иначе страница, собранная между сбросом и коммитом по старым
+    данным, осталась бы в кэше под новой версией.
+    """
+    slugs = Group.objects.filter(
+        pk__in=[group_id for group_id in group_ids if group_id]
+    ).values_list('slug', flat=True)
+    names = [
+        *(['feed:index'] if index else []),
+        *(f'feed:group:{slug}' for slug in slugs),
+        *(f'feed:profile:{username}' for username in usernames if username),
+    ]
+    cache.bump(*names)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.bump(*names))
+
+
+@receiver(pre_save, sender=User)
+def user_pre_save(sender, instance, **kwargs):
+    remember_previous(instance, 'username')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    if kwargs['update_fields'] == frozenset(('last_login',)):
+        return
+    lookups.users.invalidate(
+        instance.username, instance._previous.get('username')
+    )
+    cache.bump(f'user:{instance.pk}')
+    if instance.username != instance._previous.get('username'):
+        autocomplete.index.user_changed(instance)
+    if created:
+        # У нового пользователя нет постов ни в одной ленте.
+        return
+    invalidate_feeds(
+        group_ids=Group.objects.filter(posts__author=instance).values_list(
+            'pk', flat=True
+        ).distinct(),
+        usernames=(instance.username, instance._previous.get('username')),
+        index=Post.objects.filter(author=instance).exists(),
+    )
+
+
+@receiver(pre_save, sender=Group)
+def group_pre_save(sender, instance, **kwargs):
+    remember_previous(instance, 'slug')
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    previous_slug = instance._previous.get('slug')
+    if previous_slug and previous_slug != instance.slug:
+        cache.bump(f'feed:group:{previous_slug}')
+    cache.bump(f'group:{instance.pk}')
+    lookups.groups.invalidate(instance.slug, previous_slug)
+    autocomplete.index.group_changed(instance)
+    invalidate_feeds(
+        group_ids=(instance.pk,),
+        usernames=User.objects.filter(posts__group=instance).values_list(
+            'username', flat=True
+        ).distinct(),
+    )
+
+
+@receiver(pre_delete, sender=Group)
+def group_pre_delete(sender, instance, **kwargs):
+    # После удаления посты уже отвязаны, поэтому авторов ищем заранее.
+    invalidate_feeds(
+        group_ids=(instance.pk,),
+        usernames=User.objects.filter(posts__group=instance).values_list(
+            'username', flat=True
+        ).distinct(),
+    )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    lookups.groups.invalidate(instance.slug)
+    autocomplete.index.group_deleted(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    lookups.users.invalidate(instance.username)
+    autocomplete.index.user_deleted(instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_pre_save(sender, instance, **kwargs):
+    remember_previous(instance, 'group_id', 'image', 'text')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.author_id, posts_count=1)
+        feeds.fan_out(instance)
+    media.image_changed(instance._previous.get('image'), instance.image.name)
+    if instance.text != instance._previous.get('text'):
+        tags.sync(instance)
+    invalidate_feeds(
+        group_ids=(instance.group_id, instance._previous.get('group_id')),
+        usernames=(instance.author.username,),
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump(instance.author_id, posts_count=-1)
+    media.change_refs(instance.image.name, -1)
+    invalidate_feeds(
+        group_ids=(instance.group_id,),
+        usernames=(instance.author.username,),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.author_id, comments_count=1)
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump(instance.author_id, comments_count=-1)
+    counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.user_id, following_count=1)
+        counters.bump(instance.author_id, followers_count=1)
+        feeds.update_pulled(instance.author_id)
+        feeds.backfill(instance.user_id, instance.author_id)
+        invalidate_feeds(usernames=(instance.author.username,))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump(instance.user_id, following_count=-1)
+    counters.bump(instance.author_id, followers_count=-1)
+    feeds.trim(instance.user_id, instance.author_id)
+    feeds.update_pulled(instance.author_id)
+    invalidate_feeds(usernames=(instance.author.username,))
@@ -0,0 +1,61 @@
+import re
+
+from django.db import transaction
+
+from .models import Mention, PostTag, User
+
+TAG_RE = re.compile(r'(?<![\w#&])#(\w{1,64})')
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.@+-]{1,150})')
+
+
+def extract_tags(text):
+    return {name.lower() for name in TAG_RE.findall(text)}
+
+
+def extract_mentions(text):
+    # Точка в конце - обычно конец предложения, а не часть имени.
+    return {name.rstrip('.') for name in MENTION_RE.findall(text)}
+
+
+def sync(post):
+    """Приводит теги и упоминания поста в соответствие с его текстом."""
+    tags = extract_tags(post.text)
+    user_ids = set(User.objects.filter(
+        username__in=extract_mentions(post.text)
+    ).exclude(pk=post.author_id).values_list('pk', flat=True))
+    with transaction.atomic():
+        stored_tags = set(post.tags.values_list('name', flat=True))
+        post.tags.filter(name__in=stored_tags - tags).delete()
+        PostTag.objects.bulk_create(
+            PostTag(post=post, name=name, created=post.created)
+            for name in tags - stored_tags
+        )
+        stored_users = set(post.mentions.values_list('user_id', flat=True))
+        post.mentions.filter(user_id__in=stored_users - user_ids).delete()
+        Mention.objects.bulk_create(
+            Mention(post=post, user_id=user_id, created=post.created)
+            for user_id in user_ids - stored_users
+        )
+
+
+def create_for(posts):
+    """Создаёт теги и упоминания для пачки только что вставленных постов.
+
+    В отличие от sync() не читает сохранённые строки и ищет всех
+    упомянутых пользователей одним запросом.
+    """
+    mentioned = {post.pk: extract_mentions(post.text) for post in posts}
+    user_ids = dict(User.objects.filter(
+        username__in=set().union(*mentioned.values())
+    ).values_list('username', 'pk'))
+    PostTag.objects.bulk_create(
+        PostTag(post=post, name=name, created=post.created)
+        for post in posts
+        for name in extract_tags(post.text)
+    )
+    Mention.objects.bulk_create(
+        Mention(post=post, user_id=user_ids[name], created=post.created)
+        for post in posts
+        for name in mentioned[post.pk]
+        if user_ids.get(name, post.author_id) != post.author_id
+    )
@@ -0,0 +1,54 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.cache import get_versions
+from posts import thumbnails
+
+register = template.Library()
+
+
+def card_key(post, versions, show_group_link):
+    return 'post-card:{}:{}:{}:{}:{:d}'.format(
+        post.pk,
+        post.modified.timestamp(),
+        versions[f'user:{post.author_id}'],
+        versions.get(f'group:{post.group_id}'),
+        show_group_link,
+    )
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Отдаёт карточки постов, забирая готовые из кэша одним запросом.
+
+    Ключ карточки содержит дату изменения поста и версии его автора
+    и группы, поэтому правка любого из них даёт новый ключ.
+    """
+    posts = list(posts)
+    group = context.get('group')
+    show_group_link = not group
+    names = sorted(
+        {f'user:{post.author_id}' for post in posts}
+        | {f'group:{post.group_id}' for post in posts if post.group_id}
+    )
+    versions = dict(zip(names, get_versions(names)))
+    keys = [card_key(post, versions, show_group_link) for post in posts]
+    cards = cache.get_many(keys)
+    thumbnails.prefetch([
+        post for post, key in zip(posts, keys) if key not in cards
+    ])
+    rendered = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            rendered[key] = render_to_string(
+                'posts/includes/display_posts.html',
+                {'post': post, 'group': group},
+                request=context.get('request'),
+            )
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,25 @@
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image_variants(post):
+    """Готовые миниатюры картинки поста для srcset.
+
+    Для ленты их заранее находит post_cards через thumbnails.prefetch(),
+    одиночный пост ищется здесь же.
+    """
+    if not hasattr(post, 'image_variants'):
+        thumbnails.prefetch([post])
+    return post.image_variants
+
+
+@register.simple_tag
+def card_aspect_ratio():
+    """Пропорция миниатюры card для заглушки, например «960 / 339»."""
+    width, height = settings.POST_IMAGE_SIZES['card'][0].split('x')
+    return f'{width} / {height}'
@@ -1,12 +1,15 @@
 import shutil
 import tempfile
+from io import BytesIO
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from posts.forms import PostForm
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Group, Post
+from posts.models import Group, MediaFile, Post
+from PIL import Image
+from .utils import SMALL_GIF
 
 User = get_user_model()
 
@@ -37,17 +40,9 @@ class PostCreateFormTests(TestCase):
 
     def test_create_form(self):
         posts_count = Post.objects.count()
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
         uploaded = SimpleUploadedFile(
             name='small.gif',
-            content=small_gif,
+            content=SMALL_GIF,
             content_type='image/gif'
         )
         form_data = {
@@ -72,11 +67,14 @@ class PostCreateFormTests(TestCase):
         # Проверяем, увеличилось ли число постов
         self.assertEqual(Post.objects.count(), posts_count + 1)
         # Проверяем, что создалась запись с заданным слагом
+        # Картинка пересохраняется под именем из хэша содержимого.
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый текст',
                 group=self.group.id,
-                image='posts/small.gif'
+                image__regex=r'^posts/\w\w/\w\w/\w{64}\.\w+$',
+                image_width=2,
+                image_height=1,
             ).exists()
         )
 
@@ -122,3 +120,47 @@ class PostCreateFormTests(TestCase):
         post = Post.objects.get(id=self.group.id)
         self.assertEqual(Post.objects.count(), posts_count)
         self.assertEqual(post.text, 'Измененный тестовый текст')
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_uploaded_image_ingested(self):
+        '''Большая картинка уменьшается и теряет EXIF.'''
+        exif = Image.Exif()
+        exif[0x0110] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (300, 150), 'red').save(
+            buffer, 'JPEG', exif=exif.tobytes()
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с фотографией',
+                'image': SimpleUploadedFile(
+                    'photo.jpg', buffer.getvalue(), 'image/jpeg'
+                ),
+            },
+        )
+        post = Post.objects.get(text='Пост с фотографией')
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (100, 50))
+            self.assertNotIn('exif', stored.info)
+
+    def test_same_image_stored_once(self):
+        '''Одинаковые картинки хранятся одним файлом со счётчиком ссылок.'''
+        for text in ('Первый мем', 'Второй мем'):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': text,
+                    'image': SimpleUploadedFile(
+                        f'{text}.gif', SMALL_GIF, 'image/gif'
+                    ),
+                },
+            )
+        first, second = Post.objects.filter(text__endswith='мем')
+        self.assertEqual(first.image.name, second.image.name)
+        media_file = MediaFile.objects.get(name=first.image.name)
+        self.assertEqual(media_file.refs, 2)
+        first.delete()
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.refs, 1)
@@ -1,10 +1,35 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from sorl.thumbnail import default
 
-from ..models import Group, Post
+from .. import thumbnails
+from ..media import storage
+from ..models import (
+    Comment, Follow, Group, MediaFile, Post, TimelineEntry, UserStats
+)
+from .utils import SMALL_GIF
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
 class PostModelTest(TestCase):
     @classmethod
@@ -56,3 +81,311 @@ class PostModelTest(TestCase):
                     self.post._meta.get_field(field).help_text,
                     expected_value
                 )
+
+    def test_text_rendered_on_save(self):
+        """При сохранении текст поста переводится в экранированный HTML."""
+        post = Post.objects.create(
+            author=self.user,
+            text='<b>Первая</b> строка\n\nвторая ' + 'слово ' * 50,
+        )
+        self.assertTrue(
+            post.text_html.startswith('<p>&lt;b&gt;Первая&lt;/b&gt;')
+        )
+        self.assertIn('</p>\n\n<p>вторая', post.text_html)
+        self.assertLessEqual(len(post.excerpt), settings.POST_EXCERPT_LENGTH)
+        self.assertTrue(post.excerpt.startswith('<b>Первая</b> строка вторая'))
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(user=user.username, field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertStats(self.author, posts_count=1, followers_count=1)
+        self.assertStats(self.reader, comments_count=1, following_count=1)
+        follow.delete()
+        post.delete()
+        self.assertStats(self.author, posts_count=0, followers_count=0)
+        self.assertStats(self.reader, comments_count=0, following_count=0)
+
+    def test_profile_count_after_post(self):
+        """Число постов в профиле не берётся из закэшированного автора."""
+        cache.clear()
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertEqual(self.client.get(url).context['num_of_posts'], 0)
+        Post.objects.create(author=self.author, text='Пост')
+        response = self.client.get(url)
+        self.assertEqual(response.context['num_of_posts'], 1)
+        self.assertContains(response, 'Всего постов: 1')
+
+    def test_post_detail_count_from_join(self):
+        """Страница поста берёт счётчики из того же запроса, что и пост."""
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='Пост')
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['num_of_posts'], 1)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "posts_userstats"' in query['sql']
+        ])
+        UserStats.objects.filter(user=self.author).delete()
+        cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.context['num_of_posts'], 1)
+        self.assertStats(self.author, posts_count=1)
+
+    def test_counters_share_view_transaction(self):
+        """Счётчик откатывается вместе с постом, если запись упала."""
+        self.client.force_login(self.author)
+        with mock.patch(
+            'posts.thumbnails.enqueue', side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            self.client.post(reverse('posts:post_create'), {'text': 'Пост'})
+        self.assertFalse(Post.objects.exists())
+        self.assertStats(self.author, posts_count=0)
+
+    def test_rebuild_counters(self):
+        """Команда rebuild_counters находит и чинит расхождения."""
+        Post.objects.bulk_create(
+            [Post(author=self.author, text='Пост') for _ in range(3)]
+        )
+        UserStats.objects.filter(user=self.reader).delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', verify=True, stdout=StringIO())
+        call_command('rebuild_counters', chunk_size=1, stdout=StringIO())
+        self.assertStats(self.author, posts_count=3)
+        self.assertStats(self.reader, posts_count=0)
+        call_command('rebuild_counters', verify=True, stdout=StringIO())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_GC_GRACE_PERIOD=0)
+class CollectMediaTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='auth')
+        self.kept, self.removed = [
+            Post.objects.create(
+                author=user,
+                text='Пост с картинкой',
+                image=SimpleUploadedFile(name, content, 'image/gif'),
+            )
+            for name, content in (
+                ('kept.gif', SMALL_GIF),
+                ('removed.gif', SMALL_GIF.replace(b'\xFF', b'\x01')),
+            )
+        ]
+        thumbnails.generate(self.removed)
+        self.image = self.removed.image
+        self.name = self.image.name
+        self.removed.delete()
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command('collect_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reupload_refreshes_mtime(self):
+        """Повторная загрузка файла продлевает ему срок до удаления."""
+        path = storage.path(self.name)
+        os.utime(path, (0, 0))
+        Post.objects.create(
+            author=self.kept.author,
+            text='Та же картинка',
+            image=SimpleUploadedFile(
+                'again.gif', SMALL_GIF.replace(b'\xFF', b'\x01'), 'image/gif'
+            ),
+        )
+        self.assertGreater(os.path.getmtime(path), 0)
+
+    def test_dry_run_keeps_files(self):
+        output = self.collect('--dry-run')
+        self.assertIn(self.name, output)
+        self.assertTrue(storage.exists(self.name))
+
+    def test_orphans_removed_with_thumbnails(self):
+        self.assertIsNotNone(thumbnails.cached(self.image, 'card'))
+        self.collect('--chunk-size=1', '--max-seconds=0.000001')
+        output = self.collect('--chunk-size=1')
+        self.assertIn('Продолжаю после', output)
+        self.assertFalse(storage.exists(self.name))
+        self.assertTrue(storage.exists(self.kept.image.name))
+        self.assertIsNone(thumbnails.cached(self.image, 'card'))
+        self.assertFalse(MediaFile.objects.filter(name=self.name).exists())
+        self.assertEqual(
+            MediaFile.objects.get(name=self.kept.image.name).refs, 1
+        )
+
+    def test_thumbnails_of_lost_source_removed(self):
+        """Миниатюры картинки, удалённой в обход сборщика, удаляются."""
+        thumbnails.generate(self.kept)
+        thumbnail = thumbnails.cached(self.kept.image, 'card')
+        storage.delete(self.kept.image.name)
+        self.collect()
+        self.assertFalse(default.storage.exists(thumbnail.name))
+        self.assertIsNone(thumbnails.cached(self.kept.image, 'card'))
+
+    def test_thumbnail_files_without_keys_removed(self):
+        """Файлы миниатюр без ключей удаляются, остальные остаются."""
+        thumbnails.generate(self.kept)
+        thumbnail = thumbnails.cached(self.kept.image, 'card')
+        stray = default.storage.save(
+            'cache/00/00/stray.gif', ContentFile(SMALL_GIF)
+        )
+        self.collect('--chunk-size=1', '--max-seconds=0.000001')
+        self.collect('--chunk-size=1')
+        self.assertFalse(default.storage.exists(stray))
+        self.assertTrue(default.storage.exists(thumbnail.name))
+        self.assertTrue(storage.exists(self.kept.image.name))
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Коты', slug='cats', description='Про котов'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.path = os.path.join(self.tmp_dir, f'{self._testMethodName}.jsonl')
+        self.write([
+            {
+                'author': 'writer',
+                'text': 'Первый #Кот для @reader',
+                'group': 'cats',
+                'created': '2010-01-02T03:04:05',
+            },
+            'не json',
+            {'author': 'ghost', 'text': 'Чужой'},
+            {'author': 'writer', 'text': 'Второй'},
+        ])
+
+    def write(self, rows, mode='w'):
+        with open(self.path, mode, encoding='utf-8') as file:
+            for row in rows:
+                line = row if isinstance(row, str) else json.dumps(row)
+                file.write(line + '\n')
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_posts', self.path, *args, stdout=out, stderr=err
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_import_keeps_derived_data(self):
+        """Импорт пишет посты и всё, что обычно делают сигналы."""
+        out, err = self.run_import('--batch-size=2')
+        self.assertIn('Строка 2', err)
+        self.assertIn("нет автора 'ghost'", err)
+        self.assertIn('загружено постов: 2, пропущено: 2', out)
+        first, second = Post.objects.order_by('pk')
+        self.assertEqual(first.group, self.group)
+        self.assertEqual(
+            first.created,
+            timezone.make_aware(datetime(2010, 1, 2, 3, 4, 5)),
+        )
+        self.assertIn('<p>Первый', first.text_html)
+        self.assertEqual(second.excerpt, 'Второй')
+        self.assertEqual(
+            list(first.tags.values_list('name', 'created')),
+            [('кот', first.created)],
+        )
+        self.assertTrue(first.mentions.filter(user=self.reader).exists())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2
+        )
+
+    def test_import_resumes(self):
+        """Повторный запуск продолжает с сохранённой строки."""
+        self.run_import()
+        self.write([{'author': 'writer', 'text': 'Третий'}], mode='a')
+        out, err = self.run_import()
+        self.assertIn('Продолжаю после строки 4', out)
+        self.assertEqual(err, '')
+        self.assertEqual(Post.objects.count(), 3)
+        self.run_import('--restart')
+        self.assertEqual(Post.objects.count(), 6)
+
+    def test_interrupted_chunk_rolled_back(self):
+        """Пачка, упавшая посередине, не остаётся в базе наполовину."""
+        with mock.patch(
+            'posts.feeds.fan_out_many', side_effect=[None, RuntimeError]
+        ):
+            with self.assertRaises(RuntimeError):
+                self.run_import('--batch-size=2')
+        self.assertEqual(Post.objects.count(), 1)
+        self.run_import('--batch-size=2')
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            ['Первый #Кот для @reader', 'Второй'],
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2
+        )
+
+    def test_import_csv(self):
+        path = os.path.join(self.tmp_dir, 'posts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            file.write('author,text,group\nwriter,"Две\nстроки",\n')
+        call_command('import_posts', path, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.text, 'Две\nстроки')
+        self.assertIsNone(post.group)
+
+
+class ExportPostsTest(TestCase):
+    def test_export_can_be_imported_back(self):
+        """Выгрузка постов читается командой import_posts."""
+        author = User.objects.create_user(username='auth')
+        Post.objects.create(author=author, text='Старый #пост')
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        paths = [
+            os.path.join(tmp_dir, f'posts.{format}')
+            for format in ('jsonl', 'csv')
+        ]
+        for path in paths:
+            call_command('export_posts', author='auth', output=path,
+                         format=os.path.splitext(path)[1][1:])
+        for path in paths:
+            call_command('import_posts', path, stdout=StringIO())
+        copies = Post.objects.filter(text='Старый #пост')
+        self.assertEqual(copies.count(), 3)
+        self.assertEqual(len({post.created for post in copies}), 1)
+        with self.assertRaises(CommandError):
+            call_command('export_posts', author='ghost')
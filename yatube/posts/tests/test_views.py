@@ -1,14 +1,27 @@
+import csv
+import json
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
+from sorl.thumbnail import default
 
-from posts.models import Group, Post, Comment, Follow
+from core import cache as core_cache
+from posts import autocomplete, counters, feeds, lookups, thumbnails
+from posts.models import (
+    Comment, FeedReleaseTask, Follow, Group, Post, ThumbnailTask
+)
+from posts.tests.utils import SMALL_GIF
 
 User = get_user_model()
 
@@ -158,17 +171,9 @@ class PostPagesTests(TestCase):
 
     def test_image_in_post_passed_into_context(self):
         """Проверяем, что картинка поста передаётся в контекст"""
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
         uploaded = SimpleUploadedFile(
             name='small.gif',
-            content=small_gif,
+            content=SMALL_GIF,
             content_type='image/gif'
         )
         post_with_image = Post.objects.create(
@@ -198,29 +203,220 @@ class PostPagesTests(TestCase):
                     post_obj = response.context['post']
                 self.assertEqual(post_obj.image, post_with_image.image)
 
+    def test_thumbnails_generated_outside_request(self):
+        '''Пока миниатюры нет, выводится заглушка; миниатюры создаёт
+        очередь thumbnail_worker, а недостающие - warm_thumbnails.'''
+        response = self.author_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'thumb.gif', SMALL_GIF, 'image/gif'
+                ),
+            },
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(ThumbnailTask.objects.filter(post=post).exists())
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        response = self.author_client.get(url)
+        self.assertContains(
+            response,
+            f'width="{post.image_width}" height="{post.image_height}"',
+        )
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertIsNone(thumbnails.cached(post.image, 'card'))
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None, image_height=None
+        )
+        response = self.author_client.get(url)
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        call_command('thumbnail_worker', once=True, stdout=StringIO())
+        self.assertFalse(ThumbnailTask.objects.exists())
+        thumbnail = thumbnails.cached(post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        response = self.author_client.get(url)
+        self.assertContains(response, f'{thumbnail.url} 960w')
+        small = thumbnails.cached(post.image, 'card-480')
+        self.assertContains(response, f'{small.url} 480w')
+        self.assertContains(response, 'loading="lazy"')
+        default.kvstore.clear()
+        out = StringIO()
+        call_command('warm_thumbnails', stdout=out)
+        self.assertIn('созданы миниатюры для: 1', out.getvalue())
+
+    def test_thumbnails_prefetched_in_one_query(self):
+        '''Миниатюры для всех постов страницы читаются одним запросом.'''
+        posts = [
+            Post.objects.create(
+                author=self.author,
+                text=f'Пост с картинкой {i}',
+                # Разный цвет палитры, чтобы файлы не совпали.
+                image=SimpleUploadedFile(
+                    f'prefetch{i}.gif',
+                    SMALL_GIF.replace(b'\xFF\xFF\xFF', bytes([i] * 3)),
+                    'image/gif',
+                ),
+            )
+            for i in range(3)
+        ]
+        for post in posts[:2]:
+            thumbnails.generate(post)
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts)
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+        self.assertEqual(
+            [len(post.image_variants) for post in posts],
+            [len(settings.POST_IMAGE_SIZES)] * 2 + [0],
+        )
+
     def test_cache(self):
-        '''Проверка кэширования главной страницы.'''
+        '''Главная страница кэшируется, а изменения постов
+        сбрасывают кэш сразу.'''
         post = Post.objects.create(
             author=self.author,
             text='Тестовый пост для проверки кэша',
             group=self.group,
         )
-        response_before_del = self.author_client.get(reverse('posts:index'))
+        response_before_update = self.author_client.get(
+            reverse('posts:index')
+        )
+        # update() не шлёт сигналов, поэтому страница остаётся в кэше.
+        Post.objects.filter(pk=post.pk).update(text='Тихая правка')
+        response_after_update = self.author_client.get(
+            reverse('posts:index')
+        )
+        self.assertEqual(
+            response_before_update.content,
+            response_after_update.content
+        )
         post.delete()
         response_after_del = self.author_client.get(reverse('posts:index'))
-        self.assertEqual(
-            response_before_del.content,
+        self.assertNotEqual(
+            response_before_update.content,
             response_after_del.content
         )
+        self.assertNotIn(post, response_after_del.context['page_obj'])
+
+    def test_stale_page_served_while_rebuilding(self):
+        '''Пока страницу пересобирает другой запрос, отдаётся
+        устаревшая копия.'''
+        stale = self.author_client.get(reverse('posts:index'))
+        Post.objects.create(author=self.author, text='Свежий пост')
+        with mock.patch('core.cache._acquire', return_value=False):
+            response = self.author_client.get(reverse('posts:index'))
+        self.assertEqual(response.content, stale.content)
+        response = self.author_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_stale_page_keeps_its_etag(self):
+        '''Устаревшая копия отдаётся со своим ETag, а не со свежим.'''
+        url = reverse('posts:index')
+        stale_etag = self.author_client.get(url)['ETag']
+        Post.objects.create(author=self.author, text='Свежий пост')
+        with mock.patch('core.cache._acquire', return_value=False):
+            response = self.author_client.get(url)
+            self.assertNotContains(response, 'Свежий пост')
+            self.assertEqual(response['ETag'], stale_etag)
+            response = self.author_client.get(
+                url, HTTP_IF_NONE_MATCH=stale_etag
+            )
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHE_REBUILD_WAIT=0)
+    def test_foreign_rebuild_lock_kept(self):
+        '''Запрос без блокировки не снимает чужую блокировку сборки.'''
         cache.clear()
-        response_after_clear_cache = self.author_client.get(
-            reverse('posts:index')
-        )
+        with mock.patch('core.cache._acquire', return_value=False), \
+                mock.patch('core.cache.cache.delete') as delete:
+            response = self.author_client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([
+            call for call in delete.call_args_list
+            if call[0][0].startswith('rebuild:')
+        ])
+
+    def test_index_version_kept_for_users_without_posts(self):
+        '''Регистрация и правка пользователя без постов не сбрасывают
+        кэш главной страницы.'''
+        version, = core_cache.get_versions(['feed:index'])
+        user = User.objects.create_user(username='Newcomer')
+        user.set_password('secret')
+        user.save()
+        self.assertEqual(core_cache.get_versions(['feed:index']), [version])
+        self.author.first_name = 'Автор'
+        self.author.save()
         self.assertNotEqual(
-            response_before_del.content,
-            response_after_clear_cache.content
+            core_cache.get_versions(['feed:index']), [version]
         )
 
+    def test_post_cards_cached(self):
+        '''Карточка поста берётся из кэша, пока пост не изменён.'''
+        self.author_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        core_cache.bump('feed:index')
+        response = self.author_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()
+        response = self.author_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Тихая правка')
+
+    def test_group_lookup_cached(self):
+        '''Группа по slug берётся из кэша и сбрасывается при правке.'''
+        lookups.groups.get(self.group.slug)
+        with self.assertNumQueries(0):
+            group = lookups.groups.get(self.group.slug)
+        self.assertEqual(group, self.group)
+        Group.objects.filter(pk=self.group.pk).get().save()
+        with self.assertNumQueries(1):
+            lookups.groups.get(self.group.slug)
+        self.assertIsNone(lookups.groups.get('no-such-group'))
+
+    def test_group_cache_reset_on_group_change(self):
+        '''Правка группы сбрасывает кэш её страницы.'''
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.author_client.get(url)
+        self.group.description = 'Новое описание'
+        self.group.save()
+        response = self.author_client.get(url)
+        self.assertContains(response, 'Новое описание')
+
+    def test_conditional_get(self):
+        '''Неизменившиеся страницы отдаются ответом 304.'''
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'FirstAuthor'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.author_client.get(url)['ETag']
+                response = self.author_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertNotEqual(Client().get(url)['ETag'], etag)
+                Comment.objects.create(
+                    post=self.post, author=self.author, text='Новый'
+                )
+                self.post.save()
+                response = self.author_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_post_etag_follows_csrf_cookie(self):
+        '''После смены CSRF-куки страница поста отдаётся заново.'''
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.author_client.get(url)['ETag']
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.author_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -268,6 +464,54 @@ class PaginatorViewsTest(TestCase):
                 response = self.author_client.get(reverse_name + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
 
+    @override_settings(NUMBERED_PAGES=1)
+    def test_numbered_pages_limited(self):
+        "Номера есть только у первых страниц, дальше - курсор."
+        for reverse_name in self.names:
+            with self.subTest(reverse_name=reverse_name):
+                cache.clear()
+                response = self.author_client.get(reverse_name + '?page=2')
+                self.assertEqual(response.status_code, 404)
+                page_obj = self.author_client.get(
+                    reverse_name
+                ).context['page_obj']
+                self.assertTrue(page_obj.has_next())
+                self.assertIsNotNone(page_obj.next_cursor)
+
+    def test_cursor_pages(self):
+        "Листание по курсору отдаёт те же посты, что и по номерам страниц."
+        for reverse_name in self.names:
+            with self.subTest(reverse_name=reverse_name):
+                cache.clear()
+                first_page = self.author_client.get(reverse_name)
+                next_cursor = first_page.context['page_obj'].next_cursor
+                response = self.author_client.get(
+                    reverse_name, {'after': next_cursor}
+                )
+                page_obj = response.context['page_obj']
+                second_page = self.author_client.get(reverse_name + '?page=2')
+                self.assertEqual(
+                    [post.pk for post in page_obj],
+                    [post.pk for post in second_page.context['page_obj']],
+                )
+                self.assertFalse(page_obj.has_next())
+                response = self.author_client.get(
+                    reverse_name, {'before': page_obj.previous_cursor}
+                )
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    [post.pk for post in first_page.context['page_obj']],
+                )
+
+    def test_broken_cursor_returns_first_page(self):
+        "Испорченный курсор открывает первую страницу."
+        response = self.author_client.get(
+            reverse('posts:index'), {'after': 'broken'}
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), settings.POSTS_PER_PAGE
+        )
+
 
 class CommentTests(TestCase):
     @classmethod
@@ -320,6 +564,37 @@ class CommentTests(TestCase):
         )
         self.assertEqual(comment.author, self.user)
 
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_comments_paginated(self):
+        '''Комментарии выводятся порциями, остальные подгружаются
+        по курсору, число комментариев хранится в посте.'''
+        comments = [
+            Comment.objects.create(
+                post=self.post, author=self.user, text=f'Комментарий {i}'
+            )
+            for i in range(3)
+        ]
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        page = response.context['comments']
+        self.assertEqual(list(page), comments[:2])
+        response = self.authorized_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': page.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(list(response.context['comments']), comments[2:])
+        response = self.authorized_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'order': 'newest'},
+        )
+        self.assertEqual(
+            list(response.context['comments']), comments[:0:-1]
+        )
+
 
 class FollowTests(TestCase):
     @classmethod
@@ -334,6 +609,7 @@ class FollowTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.non_follower_client = Client()
         self.non_follower_client.force_login(self.non_follower)
         self.follower_client = Client()
@@ -360,6 +636,27 @@ class FollowTests(TestCase):
         )
         self.assertEqual(Follow.objects.count(), follow_count)
 
+    def test_cached_profile_personalized(self):
+        '''Закэшированная страница одна на всех, но шапка и кнопка
+        подписки у каждого пользователя свои.'''
+        Follow.objects.create(user=self.follower, author=self.author)
+        url = reverse(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+        with mock.patch(
+            'posts.views.counters.stats_for', wraps=counters.stats_for
+        ) as stats_for:
+            follower_page = self.follower_client.get(url).content.decode()
+            other_page = self.non_follower_client.get(url).content.decode()
+            author_page = self.following_client.get(url).content.decode()
+        self.assertEqual(stats_for.call_count, 1)
+        self.assertIn('Пользователь: Follower', follower_page)
+        self.assertIn('Отписаться', follower_page)
+        self.assertIn('Пользователь: NonFollower', other_page)
+        self.assertIn('Подписаться', other_page)
+        self.assertNotIn('Подписаться', author_page)
+        self.assertNotIn('Отписаться', author_page)
+
     def test_following_pub(self):
         '''Запись автора появляется у тех, кто на него подписан,
         и не появляется у остальных.'''
@@ -379,3 +676,328 @@ class FollowTests(TestCase):
             non_follower_response.content,
             follower_response.content
         )
+
+    def test_timeline_fan_out_and_trim(self):
+        '''Новый пост попадает в ленту подписчика, а после отписки
+        посты автора из ленты убираются.'''
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(
+            self.follower.timeline.filter(post=self.post).exists()
+        )
+        new_post = Post.objects.create(
+            text='Пост после подписки',
+            author=self.author,
+        )
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'])
+        self.follower_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.author.username}
+            )
+        )
+        self.assertFalse(self.follower.timeline.exists())
+        self.assertFalse(self.non_follower.timeline.exists())
+
+    @override_settings(FEED_PUSH_THRESHOLD=1, POSTS_PER_PAGE=2)
+    def test_hybrid_feed_merges_pulled_authors(self):
+        '''Посты популярных авторов подмешиваются в ленту при чтении
+        без дублей и в общем порядке.'''
+        cache.clear()
+        other_author = User.objects.create_user(username='OtherAuthor')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.non_follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=other_author)
+        cache.clear()
+        posts = [self.post] + [
+            Post.objects.create(text=f'Пост {i}', author=author)
+            for i, author in enumerate(
+                (other_author, self.author, other_author, self.author)
+            )
+        ]
+        self.assertFalse(
+            self.follower.timeline.filter(post=posts[-1]).exists()
+        )
+        seen = []
+        params = {}
+        while True:
+            response = self.follower_client.get(
+                reverse('posts:follow_index'), params
+            )
+            page_obj = response.context['page_obj']
+            seen.extend(post.pk for post in page_obj)
+            if not page_obj.has_next():
+                break
+            params = {'after': page_obj.next_cursor}
+        self.assertEqual(seen, [post.pk for post in reversed(posts)])
+
+    @override_settings(FEED_PUSH_THRESHOLD=1, FEED_PUSH_RELEASE_THRESHOLD=1)
+    def test_unpulled_author_posts_kept(self):
+        '''Посты, написанные за время подмешивания, остаются в ленте,
+        когда автор снова раскладывается по лентам.'''
+        cache.clear()
+        Follow.objects.create(user=self.follower, author=self.author)
+        follow = Follow.objects.create(
+            user=self.non_follower, author=self.author
+        )
+        self.assertIn(self.author.pk, feeds.pulled_authors())
+        post = Post.objects.create(
+            text='Пока подмешивался', author=self.author
+        )
+        follow.delete()
+        # Отписка только ставит задачу: автор пока подмешивается.
+        self.assertIn(self.author.pk, feeds.pulled_authors())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        call_command('feed_worker', once=True, stdout=StringIO())
+        self.assertNotIn(self.author.pk, feeds.pulled_authors())
+        self.assertTrue(self.follower.timeline.filter(post=post).exists())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    @override_settings(FEED_PUSH_THRESHOLD=1, FEED_PUSH_RELEASE_THRESHOLD=0)
+    def test_pull_mode_has_hysteresis(self):
+        '''Отписка у порога не возвращает автора к раскладке.'''
+        cache.clear()
+        Follow.objects.create(user=self.follower, author=self.author)
+        follow = Follow.objects.create(
+            user=self.non_follower, author=self.author
+        )
+        follow.delete()
+        self.assertFalse(FeedReleaseTask.objects.exists())
+        self.assertIn(self.author.pk, feeds.pulled_authors())
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Searcher')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Котики <b>спят</b> на солнце'
+        )
+        cls.other = Post.objects.create(
+            author=cls.author, text='Собаки гуляют во дворе'
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_finds_and_highlights(self):
+        '''Поиск находит пост по началу слова и подсвечивает его.'''
+        posts = self.search('кот')
+        self.assertEqual(posts, [self.post])
+        self.assertIn('<mark>Котики</mark>', posts[0].snippet)
+        self.assertIn('&lt;b&gt;', posts[0].snippet)
+        self.assertEqual(self.search('кот"* ('), [self.post])
+        self.assertEqual(self.search(''), [])
+
+    def test_index_follows_writes(self):
+        '''Индекс обновляется при правке и удалении постов.'''
+        self.other.text = 'Кошки гуляют сами по себе'
+        self.other.save()
+        self.assertEqual(self.search('кошки'), [self.other])
+        self.assertEqual(self.search('собаки'), [])
+        Post.objects.filter(pk=self.post.pk).update(text='Без животных')
+        self.assertEqual(self.search('котики'), [])
+        self.other.delete()
+        self.assertEqual(self.search('гуляют'), [])
+
+    def test_migrate_restores_triggers(self):
+        '''Миграции возвращают триггеры, удалённые пересборкой таблицы.'''
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        missed = Post.objects.create(author=self.author, text='Ежи спят')
+        self.assertEqual(self.search('ежи'), [])
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertEqual(self.search('ежи'), [missed])
+        added = Post.objects.create(author=self.author, text='Ужи спят')
+        self.assertEqual(self.search('ужи'), [added])
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other]
+        )
+
+
+@override_settings(AUTOCOMPLETE_REFRESH=0)
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Cat_lover')
+        self.group = Group.objects.create(
+            title='Кошатники', slug='cats', description='Про кошек'
+        )
+
+    def suggest(self, query):
+        response = self.client.get(
+            reverse('posts:autocomplete'), {'q': query}
+        )
+        return [item['label'] for item in response.json()['results']]
+
+    def test_prefix_search(self):
+        '''Подсказки ищутся по началу имени, названия и slug группы.'''
+        self.assertEqual(self.suggest('cat'), ['Cat_lover', 'Кошатники'])
+        self.assertEqual(self.suggest('кош'), ['Кошатники'])
+        self.assertEqual(self.suggest(''), [])
+        with self.assertNumQueries(0):
+            autocomplete.index.search('cat')
+
+    def test_index_updated_on_change(self):
+        '''Переименование и удаление сразу видны в подсказках.'''
+        self.suggest('cat')
+        self.user.username = 'Dog_lover'
+        self.user.save()
+        self.group.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(autocomplete.index.search('cat'), [])
+        self.assertEqual(self.suggest('dog'), ['Dog_lover'])
+
+    def test_other_process_applies_changes(self):
+        '''Другой процесс применяет правки из кэша, не читая таблицы.'''
+        other = autocomplete.PrefixIndex()
+        self.assertEqual(len(other.search('cat')), 2)
+        self.user.username = 'Dog_lover'
+        self.user.save()
+        User.objects.create_user(username='Dog_walker')
+        other._checked = 0
+        with self.assertNumQueries(0):
+            found = other.search('dog')
+        self.assertEqual(
+            [item['label'] for item in found], ['Dog_lover', 'Dog_walker']
+        )
+        self.group.delete()
+        cache.delete(autocomplete._change_key(other._version + 1))
+        other._checked = 0
+        self.assertEqual(other.search('cat'), [])
+
+
+@override_settings(POSTS_PER_PAGE=2)
+class TagTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='reader.one')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_tags_and_mentions_extracted(self):
+        '''Теги и упоминания разбираются при сохранении и правке.'''
+        post = Post.objects.create(
+            author=self.author,
+            text='#Django и #python, привет @reader.one. &#x27; @nobody',
+        )
+        self.assertEqual(
+            set(post.tags.values_list('name', flat=True)),
+            {'django', 'python'},
+        )
+        self.assertEqual(
+            list(post.mentions.values_list('user', flat=True)),
+            [self.reader.pk],
+        )
+        post.text = 'Только #python'
+        post.save()
+        self.assertEqual(
+            list(post.tags.values_list('name', flat=True)), ['python']
+        )
+        self.assertFalse(post.mentions.exists())
+
+    def test_tag_and_mentions_pages(self):
+        '''Страницы тега и упоминаний листаются по ключу.'''
+        posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {i} #тест для @reader.one'
+            )
+            for i in range(3)
+        ]
+        Post.objects.create(author=self.author, text='Без тега')
+        for url in (
+            reverse('posts:tag', kwargs={'name': 'Тест'}),
+            reverse('posts:mentions'),
+        ):
+            with self.subTest(url=url):
+                page_obj = self.client.get(url).context['page_obj']
+                self.assertEqual(list(page_obj), posts[:0:-1])
+                page_obj = self.client.get(
+                    url, {'after': page_obj.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(page_obj), posts[:1])
+                self.assertFalse(page_obj.has_next())
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='exporter')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост, "{i}"'
+            )
+            for i in range(3)
+        ]
+        Post.objects.create(author=cls.author, text='Без группы')
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Коммент'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode(), response
+
+    def test_group_export_jsonl(self):
+        """Выгрузка группы отдаётся потоком в JSON Lines."""
+        body, response = self.download(
+            reverse('posts:group_export', kwargs={'slug': 'export'})
+        )
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="export-posts.jsonl"',
+        )
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [row['text'] for row in rows],
+            [post.text for post in self.posts],
+        )
+        self.assertEqual(rows[0]['author'], 'exporter')
+        self.assertEqual(rows[0]['group'], 'export')
+
+    def test_profile_export_csv_and_comments(self):
+        url = reverse('posts:profile_export', kwargs={'username': 'exporter'})
+        body, _ = self.download(url, format='csv')
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1]['text'], 'Пост, "1"')
+        body, _ = self.download(url, kind='comments')
+        self.assertEqual(
+            json.loads(body)['post'], self.posts[0].pk
+        )
+        response = self.client.get(url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_requires_login(self):
+        self.client.logout()
+        response = self.client.get(
+            reverse('posts:group_export', kwargs={'slug': 'export'})
+        )
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,86 @@
+from django.conf import settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .models import ThumbnailTask
+
+
+def _thumbnail_file(image, size):
+    # Имя файла считается так же, как в ThumbnailBackend.get_thumbnail,
+    # но картинка не читается и не уменьшается.
+    geometry, options = settings.POST_IMAGE_SIZES[size]
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def cached(image, size):
+    """Готовая миниатюра размера size или None, если её ещё нет."""
+    return default.kvstore.get(_thumbnail_file(image, size))
+
+
+def prefetch(posts):
+    """Находит готовые миниатюры постов одним чтением хранилища ключей.
+
+    Результат кладётся в post.image_variants по возрастанию ширины.
+    """
+    wanted = [
+        (post, _thumbnail_file(post.image, size))
+        for post in posts if post.image
+        for size in settings.POST_IMAGE_SIZES
+    ]
+    found = default.kvstore.get_many(
+        [thumbnail for post, thumbnail in wanted]
+    )
+    for post in posts:
+        post.image_variants = []
+    for post, thumbnail in wanted:
+        if found[thumbnail.key] is not None:
+            post.image_variants.append(found[thumbnail.key])
+    for post in posts:
+        post.image_variants.sort(key=lambda thumbnail: thumbnail.width)
+
+
+def generate(post):
+    """Создаёт недостающие миниатюры поста.
+
+    Возвращает True, если появилась хотя бы одна новая миниатюра.
+    """
+    created = False
+    for size, (geometry, options) in settings.POST_IMAGE_SIZES.items():
+        if cached(post.image, size) is None:
+            get_thumbnail(post.image, geometry, **options)
+            created = cached(post.image, size) is not None or created
+    return created
+
+
+def enqueue(post):
+    """Ставит создание миниатюр поста в очередь thumbnail_worker."""
+    if post.image:
+        ThumbnailTask.objects.update_or_create(post=post)
+
+
+def process(task):
+    """Создаёт миниатюры поста из очереди и снимает задачу.
+
+    Новая дата изменения поста сбрасывает карточки и ленты, в которых
+    вместо картинки стояла заглушка.
+    """
+    post = task.post
+    if post.image and generate(post):
+        post.save(update_fields=['modified'])
+    ThumbnailTask.objects.filter(
+        pk=task.pk, created=task.created
+    ).delete()
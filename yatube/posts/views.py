@@ -1,21 +1,49 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.middleware.csrf import get_token
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import (
+    Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404, render, redirect
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
 
-from .models import Group, Post, Follow, User
+from core.cache import cache_page_versioned, etag_for, versioned_etag
+from core.paginator import (
+    CursorPaginator, LimitedPaginator, MergedCursorPaginator
+)
+from . import (
+    autocomplete, counters, export, feeds, lookups, search, thumbnails
+)
+from .models import Follow, Post, PostTag, UserStats
 from .forms import PostForm, CommentForm
 
 
-def paginator(request, post_list):
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def paginator(request, post_list, key=('created', 'id')):
+    cursor_paginator = CursorPaginator(
+        post_list, settings.POSTS_PER_PAGE, key=key
+    )
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        return cursor_paginator.get_page(after=after, before=before)
+    page_number = request.GET.get('page', '')
+    # Номера есть только у первых страниц: глубже OFFSET читал бы всё
+    # пропущенное, а по курсору страница стоит одинаково.
+    if page_number.isdigit() and int(page_number) > settings.NUMBERED_PAGES:
+        raise Http404('Дальше листайте по ссылке «Следующая».')
+    page_obj = LimitedPaginator(
+        post_list, settings.POSTS_PER_PAGE, settings.NUMBERED_PAGES
+    ).get_page(page_number)
+    if page_obj.has_next():
+        page_obj.next_cursor = cursor_paginator.cursor_for(page_obj[-1])
     return page_obj
 
 
-@cache_page(20, key_prefix="index_page")
+@condition(etag_func=versioned_etag('feed:index'))
+@cache_page_versioned(settings.FEED_CACHE_TIMEOUT, 'feed:index')
 def index(request):
     post_list = Post.objects.select_related('author', 'group')
     page_obj = paginator(request, post_list)
@@ -26,8 +54,10 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=versioned_etag('feed:group:{slug}'))
+@cache_page_versioned(settings.FEED_CACHE_TIMEOUT, 'feed:group:{slug}')
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = lookups.groups.get_or_404(slug)
     post_list = group.posts.select_related('author')
     page_obj = paginator(request, post_list)
     context = {
@@ -37,19 +67,16 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=versioned_etag('feed:profile:{username}'))
+@cache_page_versioned(
+    settings.FEED_CACHE_TIMEOUT, 'feed:profile:{username}'
+)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = (
-        request.user.is_authenticated and Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
-    )
+    author = lookups.users.get_or_404(username)
     posts = author.posts.select_related('group')
-    num_of_posts = posts.count()
+    num_of_posts = counters.stats_for(author).posts_count
     page_obj = paginator(request, posts)
     context = {
-        'following': following,
         'posts': posts,
         'author': author,
         'page_obj': page_obj,
@@ -59,22 +86,96 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = Paginator(
+        search.SearchResults(query), settings.POSTS_PER_PAGE
+    ).get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def autocomplete_view(request):
+    return JsonResponse(
+        {'results': autocomplete.index.search(request.GET.get('q', ''))}
+    )
+
+
+def post_detail_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'modified', 'comments_count', 'author_id', 'author__username',
+        'group_id',
+    ).first()
+    if post is None:
+        return None
+    names = [
+        f'user:{post["author_id"]}',
+        f'feed:profile:{post["author__username"]}',
+    ]
+    if post['group_id']:
+        names.append(f'group:{post["group_id"]}')
+    # В форме комментария есть csrf_token: после смены куки (например,
+    # при входе) старая страница из кэша браузера получит ответ 403.
+    # get_token() заводит куку сразу, чтобы ETag совпал с ответом.
+    get_token(request)
+    return etag_for(
+        request, names, post['modified'], post['comments_count'],
+        request.META['CSRF_COOKIE'],
+    )
+
+
+@condition(etag_func=post_detail_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    num_of_posts = post.author.posts.count()
-    title = post.text[:30]
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    try:
+        # Пост только что из базы, счётчики пришли с ним одним запросом.
+        stats = post.author.stats
+    except UserStats.DoesNotExist:
+        stats = counters.stats_for(post.author)
+    num_of_posts = stats.posts_count
+    title = post.excerpt or post.text[:30]
     form = CommentForm()
-    comments = post.comments.select_related('author')
     context = {
         'post': post,
         'num_of_posts': num_of_posts,
         'title': title,
         'form': form,
-        'comments': comments,
+        **comments_context(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_context(request, post):
+    newest_first = request.GET.get('order') == 'newest'
+    comments = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        descending=newest_first,
+    ).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return {
+        'post': post,
+        'comments': comments,
+        'order': 'newest' if newest_first else 'oldest',
+    }
+
+
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    return render(
+        request,
+        'posts/includes/comments.html',
+        comments_context(request, post),
+    )
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -82,9 +183,13 @@ def post_create(request):
         files=request.FILES or None,
     )
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        # Счётчики и ленты обновляют сигналы: пусть они попадут в ту же
+        # транзакцию, что и сам пост.
+        with transaction.atomic():
+            post = form.save(commit=False)
+            post.author = request.user
+            post.save()
+            thumbnails.enqueue(post)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -100,7 +205,10 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        post = form.save()
+        with transaction.atomic():
+            post = form.save()
+            if 'image' in form.changed_data:
+                thumbnails.enqueue(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'post': post,
@@ -115,29 +223,126 @@ def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment = form.save(commit=False)
+            comment.author = request.user
+            comment.post = post
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def follow_index_etag(request):
+    # Лента меняется вместе с общей лентой и при смене подписок.
+    follows = Follow.objects.filter(user=request.user).aggregate(
+        count=Count('id'), last=Max('id')
+    )
+    return etag_for(
+        request, ['feed:index'], follows['count'], follows['last']
+    )
+
+
 @login_required
+@condition(etag_func=follow_index_etag)
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__following__user=request.user
+    entries = request.user.timeline.select_related(
+        'post__author', 'post__group'
     )
-    page_obj = paginator(request, post_list)
+    pulled = feeds.followed_pulled_authors(request.user)
+    if pulled:
+        sources = [
+            CursorPaginator(
+                entries, settings.POSTS_PER_PAGE, key=('created', 'post_id')
+            )
+        ] + [
+            CursorPaginator(
+                Post.objects.filter(author_id=author_id).select_related(
+                    'author', 'group'
+                ),
+                settings.POSTS_PER_PAGE,
+            )
+            for author_id in pulled
+        ]
+        page_obj = MergedCursorPaginator(
+            sources, settings.POSTS_PER_PAGE
+        ).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    else:
+        page_obj = paginator(request, entries, key=('created', 'post_id'))
+    page_obj.object_list = feeds.as_posts(page_obj)
     context = {
-        'posts': post_list,
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+def tag_posts(request, name):
+    entries = PostTag.objects.filter(name=name.lower()).select_related(
+        'post__author', 'post__group'
+    )
+    page_obj = entries_page(request, entries)
+    context = {
+        'tag': name.lower(),
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/tag.html', context)
+
+
+@login_required
+def mentions(request):
+    entries = request.user.mentions.select_related(
+        'post__author', 'post__group'
+    )
+    context = {
+        'page_obj': entries_page(request, entries),
+    }
+    return render(request, 'posts/mentions.html', context)
+
+
+def entries_page(request, entries):
+    """Страница постов по индексу (created, post_id) с переходом по ключу."""
+    page_obj = CursorPaginator(
+        entries, settings.POSTS_PER_PAGE, key=('created', 'post_id')
+    ).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    page_obj.object_list = [entry.post for entry in page_obj]
+    return page_obj
+
+
+@login_required
+def profile_export(request, username):
+    author = lookups.users.get_or_404(username)
+    return export_response(request, author.username, author=author)
+
+
+@login_required
+def group_export(request, slug):
+    group = lookups.groups.get_or_404(slug)
+    return export_response(request, group.slug, group=group)
+
+
+def export_response(request, name, **filters):
+    """Отдаёт выгрузку потоком, не собирая её в памяти."""
+    kind = request.GET.get('kind', 'posts')
+    format = request.GET.get('format', 'jsonl')
+    if kind not in export.FIELDS or format not in export.FORMATS:
+        return HttpResponseBadRequest('Неизвестный вид или формат выгрузки.')
+    response = StreamingHttpResponse(
+        export.render(kind, format, **filters),
+        content_type=f'{export.FORMATS[format]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}-{kind}.{format}"'
+    )
+    return response
+
+
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = lookups.users.get_or_404(username)
     if request.user != author:
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', author)
@@ -145,6 +350,6 @@ def profile_follow(request, username):
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = lookups.users.get_or_404(username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', author)
@@ -16,6 +16,37 @@ import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 POSTS_PER_PAGE = 10
+# Сколько первых страниц лент доступны по номеру; дальше - по курсору.
+NUMBERED_PAGES = 5
+COMMENTS_PER_PAGE = 20
+POST_EXCERPT_LENGTH = 60
+# Ленты кэшируются надолго: при изменениях версия ключа сбрасывается.
+FEED_CACHE_TIMEOUT = 60 * 60 * 4
+# Сколько ещё отдавать устаревшую страницу, пока её пересобирает
+# другой запрос, и сколько ждать чужой пересборки при пустом кэше.
+CACHE_STALE_TIMEOUT = 60 * 60
+CACHE_REBUILD_LOCK_TIMEOUT = 30
+CACHE_REBUILD_WAIT = 2
+# Отрисованные карточки постов: ключ меняется при любой правке.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Кэш групп и пользователей по slug/username: L1 в памяти процесса,
+# L2 - общий кэш.
+OBJECT_CACHE_TIMEOUT = 60 * 60
+OBJECT_CACHE_L1_TIMEOUT = 5
+OBJECT_CACHE_L1_SIZE = 1000
+
+# Сколько последних постов автора попадает в ленту сразу после подписки.
+TIMELINE_BACKFILL = 500
+# Размер пачки при раскладке постов по лентам подписчиков.
+TIMELINE_BATCH_SIZE = 1000
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении /follow/. Обратно к раскладке автор
+# возвращается, только опустившись до FEED_PUSH_RELEASE_THRESHOLD, чтобы
+# подписки и отписки у порога не переключали его туда и обратно.
+FEED_PUSH_THRESHOLD = 10000
+FEED_PUSH_RELEASE_THRESHOLD = 8000
+FEED_WORKER_INTERVAL = 5
+FEED_PULLED_AUTHORS_TIMEOUT = 60 * 5
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -152,8 +183,66 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Отдача медиа через core.views.serve_media. Если указан заголовок
+# (X-Accel-Redirect для nginx, X-Sendfile для Apache), тело отдаёт
+# фронт-сервер по адресу MEDIA_SENDFILE_PREFIX + путь файла.
+MEDIA_SENDFILE_HEADER = None
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 60 * 60
+# Файлы с хэшем содержимого в имени не меняются никогда: картинки
+# постов и миниатюры sorl-thumbnail.
+MEDIA_IMMUTABLE_PATTERNS = (
+    r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$',
+    r'^cache/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}\.\w+$',
+)
+
+# Общий для всех воркеров кэш в файле SQLite: cache_page, сессии
+# и хранилище ключей sorl-thumbnail видят одни и те же данные.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Тесты переносят кэш во временный каталог, см. core.runner.
+TEST_RUNNER = 'core.runner.TestRunner'
+
+THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+THUMBNAIL_CACHE = 'default'
+
+# Загруженные картинки уменьшаются до этого размера по длинной стороне
+# и пересохраняются с этим качеством.
+POST_IMAGE_MAX_SIZE = 2048
+POST_IMAGE_QUALITY = 85
+
+# Подсказки по именам пользователей и группам: сколько выдавать и как
+# часто процесс сверяет свой индекс с правками в других процессах.
+# Если процесс отстал больше чем на AUTOCOMPLETE_MAX_CHANGES правок,
+# он перестраивает индекс целиком, а не применяет их по одной.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_REFRESH = 30
+AUTOCOMPLETE_MAX_CHANGES = 1000
+
+# Выгрузки постов и комментариев читаются из базы и отдаются клиенту
+# пачками по столько строк.
+EXPORT_CHUNK_SIZE = 2000
+
+# Файлы моложе этого срока сборщик collect_media не удаляет: пост
+# с ними может быть ещё не сохранён.
+MEDIA_GC_GRACE_PERIOD = 60 * 60
+
+# Размеры миниатюр картинок постов: их создаёт команда
+# thumbnail_worker после загрузки, а шаблоны только берут готовые.
+# Все размеры одной пропорции и выводятся вместе в srcset.
+POST_IMAGE_SIZES = {
+    'card-480': ('480x170', {'crop': 'center', 'upscale': True}),
+    'card-720': ('720x254', {'crop': 'center', 'upscale': True}),
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_WORKER_INTERVAL = 5